@@ -0,0 +1,163 @@
+import sys
+import socket
+import struct
+import asyncio
+
+# A2S_INFO server queries, one UDP round trip tells us a server is up along with its map and player count
+# Much cheaper than finding out over RCON, a dead server there costs a whole TCP connect timeout
+# Request:  \xff\xff\xff\xff T Source Engine Query\0 [challenge]
+# Response: \xff\xff\xff\xff I protocol name\0 map\0 folder\0 game\0 appid players maxplayers bots ...
+# Servers since 2020 answer the first request with \xff\xff\xff\xff A <challenge> and want it sent back
+A2S_HEADER:bytes = b'\xff\xff\xff\xff'
+A2S_INFO_REQUEST:bytes = A2S_HEADER + b'TSource Engine Query\0'
+A2S_INFO_RESPONSE:int = ord('I')
+A2S_CHALLENGE_RESPONSE:int = ord('A')
+A2S_TIMEOUT:float = 1.0 # Seconds, anything on the internet answers well within this
+
+class ServerInfo:
+    __slots__ = ("name", "map", "folder", "game", "players", "max_players", "bots")
+
+    def __init__(self, name:str, map:str, folder:str, game:str, players:int, max_players:int, bots:int) -> None:
+        self.name = name
+        self.map = map
+        self.folder = folder
+        self.game = game
+        self.players = players # Bots included
+        self.max_players = max_players
+        self.bots = bots
+
+    def describe(self) -> str:
+        return f"{self.map}, {self.players - self.bots}/{self.max_players} in game"
+
+def parse_info(data:bytes) -> ServerInfo:
+    if len(data) < 6 or not data.startswith(A2S_HEADER) or data[4] != A2S_INFO_RESPONSE:
+        return None
+
+    try:
+        offset:int = 6 # Past the header and protocol version
+        strings:list = []
+        for _ in range(4):
+            end:int = data.index(b'\0', offset)
+            strings.append(data[offset:end].decode("utf-8", "replace"))
+            offset = end + 1
+
+        _, players, max_players, bots = struct.unpack_from("<hBBB", data, offset)
+    except (ValueError, struct.error):
+        return None # Cut short
+
+    return ServerInfo(*strings, players, max_players, bots)
+
+def parse_challenge(data:bytes) -> bytes:
+    if len(data) < 9 or not data.startswith(A2S_HEADER) or data[4] != A2S_CHALLENGE_RESPONSE:
+        return None
+
+    return data[5:9]
+
+def format_info(info:ServerInfo, appid:int = 440) -> bytes:
+    return (
+        A2S_HEADER + b'I' + bytes([17]) +
+        b''.join(text.encode() + b'\0' for text in (info.name, info.map, info.folder, info.game)) +
+        struct.pack("<hBBBccBB", appid, info.players, info.max_players, info.bots, b'd', b'l', 0, 1) +
+        b'1.0.0.0\0'
+    )
+
+def format_challenge(challenge:bytes) -> bytes:
+    return A2S_HEADER + b'A' + challenge
+
+class ProbeProtocol(asyncio.DatagramProtocol):
+    def __init__(self, prober) -> None:
+        self.prober = prober
+
+    def datagram_received(self, data:bytes, addr:tuple) -> None:
+        self.prober.on_reply(data, addr[:2])
+
+    def error_received(self, exc:Exception) -> None:
+        pass # Port unreachable and the like, the query just times out
+
+# Every server is queried from the same socket, replies are matched up by the address they came from
+# so probing all of them is one pass of sends and however many replies come back before the timeout
+class A2SProber:
+    def __init__(self, timeout:float = A2S_TIMEOUT) -> None:
+        self.timeout = timeout
+        self.transport:asyncio.DatagramTransport = None
+        self.waiting:dict = {} # (ip, port) => future for the query in flight
+        # Last challenge each server gave us, sent along with the next query so it's usually one round trip
+        # rather than two, also keeps us under sv_max_queries_sec
+        self.challenges:dict = {} # (ip, port) => challenge
+
+    async def start(self, bind_address:str = "0.0.0.0") -> None:
+        self.transport, _ = await asyncio.get_running_loop().create_datagram_endpoint(
+            lambda: ProbeProtocol(self),
+            local_addr=(bind_address, 0)
+        )
+
+    def close(self) -> None:
+        if self.transport is not None:
+            self.transport.close()
+            self.transport = None
+
+        for waiter in self.waiting.values():
+            waiter.cancel()
+        self.waiting.clear()
+
+    def send(self, address:tuple) -> None:
+        self.transport.sendto(A2S_INFO_REQUEST + self.challenges.get(address, b''), address)
+
+    def on_reply(self, data:bytes, address:tuple) -> None:
+        waiter:asyncio.Future = self.waiting.get(address)
+        if waiter is None or waiter.done():
+            return # Late, or not something we asked
+
+        challenge:bytes = parse_challenge(data)
+        if challenge is not None:
+            self.challenges[address] = challenge
+            self.send(address)
+            return
+
+        info:ServerInfo = parse_info(data)
+        if info is not None:
+            waiter.set_result(info)
+
+    # None if the server didn't answer within the timeout
+    async def query(self, address:tuple) -> ServerInfo:
+        if self.transport is None:
+            return None
+
+        waiter:asyncio.Future = asyncio.get_running_loop().create_future()
+        self.waiting[address] = waiter
+
+        try:
+            self.send(address)
+            return await asyncio.wait_for(waiter, self.timeout)
+        except (asyncio.TimeoutError, OSError):
+            self.challenges.pop(address, None) # Might have restarted with a new one
+            return None
+        finally:
+            if self.waiting.get(address) is waiter:
+                self.waiting.pop(address)
+
+    # (ip, port) => ServerInfo or None, every query goes out before any reply is waited on
+    async def probe(self, addresses:list) -> dict:
+        results:list = await asyncio.gather(*(self.query(address) for address in addresses))
+        return dict(zip(addresses, results))
+
+
+# Queries servers from the command line, handy for checking a server's query port is reachable
+# python3 a2s.py 127.0.0.1 27015 [address port ...]
+async def main(addresses:list) -> None:
+    prober:A2SProber = A2SProber()
+    await prober.start()
+
+    results:dict = await prober.probe(addresses)
+    prober.close()
+
+    for (address, port), info in results.items():
+        print(f"{address}:{port} => {info.name} ({info.describe()})" if info is not None else f"{address}:{port} => no answer")
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3 or len(sys.argv) % 2 == 0:
+        print(f"Usage: {sys.argv[0]} address port [address port ...]")
+        sys.exit(1)
+
+    # Replies come from the IP, not the name
+    asyncio.run(main([(socket.gethostbyname(sys.argv[i]), int(sys.argv[i + 1])) for i in range(1, len(sys.argv), 2)]))
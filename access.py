@@ -0,0 +1,65 @@
+import discord
+import config
+import testing
+from discord import app_commands
+
+# Channel and coordinator checks for slash commands, these run before the command does anything
+# The coordinator role is looked up by name once per guild and remembered by ID until a role in that guild changes
+role_ids:dict = {} # guild id => coordinator role id, None if the guild doesn't have one
+
+class BadChannel(app_commands.CheckFailure):
+    pass
+
+class AccessDenied(app_commands.CheckFailure):
+    pass
+
+def coordinator_role_id(guild:discord.Guild) -> int:
+    if guild.id not in role_ids:
+        role:discord.Role = discord.utils.get(guild.roles, name=config.coordinator_role_name)
+        role_ids[guild.id] = role.id if role is not None else None
+
+    return role_ids[guild.id]
+
+# Roles were created, renamed or deleted, look it up again next time
+def invalidate(guild:discord.Guild = None) -> None:
+    if guild is None:
+        role_ids.clear()
+    else:
+        role_ids.pop(guild.id, None)
+
+def check_channel(interaction:discord.Interaction) -> bool:
+    if interaction.channel_id != testing.testing_channel_id:
+        raise BadChannel()
+
+    return True
+
+def check_coordinator(interaction:discord.Interaction) -> bool:
+    check_channel(interaction)
+
+    if interaction.guild is None:
+        raise AccessDenied()
+
+    role_id:int = coordinator_role_id(interaction.guild)
+    if role_id is None or interaction.user.get_role(role_id) is None:
+        raise AccessDenied()
+
+    return True
+
+# @testing_channel() and @coordinator() go under @tree.command
+def testing_channel():
+    return app_commands.check(check_channel)
+
+def coordinator():
+    return app_commands.check(check_coordinator)
+
+# Hooked up as the tree's error handler
+async def on_check_failure(interaction:discord.Interaction, error:app_commands.AppCommandError) -> bool:
+    if isinstance(error, BadChannel):
+        msg:str = config.msg_bad_channel
+    elif isinstance(error, AccessDenied):
+        msg:str = config.msg_access_denied
+    else:
+        return False
+
+    await interaction.response.send_message(msg, ephemeral=True)
+    return True
@@ -0,0 +1,411 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tracemalloc
+import testing
+from a2s import A2SProber
+from rcon import (
+    arcon,
+    rcon
+)
+from testing import (
+    JoinStatus,
+    Tester,
+    PlayerInfo,
+    PlayerJoinStatus,
+    RCONInfo,
+    RCONPoller,
+    ServerState
+)
+from playerinfo import (
+    parse_player_info,
+    parse_player_infos
+)
+
+# Benchmarks for the tracker, run with python3 bench.py <name>
+
+def make_player_info_response(players:int) -> str:
+    return "\n".join(f"[U:1:{1000 + i}] {i + 2} Tester Number {i}" for i in range(players))
+
+# Closer to what a real server sends, bots, blank lines and names with spaces and unicode
+def make_messy_player_info_response(players:int, offset:int = 0) -> str:
+    lines:list = ["", "BOT 1 Pirate Bot"]
+    for i in range(offset, offset + players):
+        lines.append(f"[U:1:{1000 + i}] {i + 2} Skål Tester <{i}> ☠ the {'great ' * (i % 3)}")
+        if i % 16 == 0:
+            lines.append("")
+    
+    return "\n".join(lines) + "\n"
+
+# The parser RCONThread used to have inline, kept here to compare against
+def split_parse(response:str) -> dict:
+    player_data:dict = {}
+
+    for line in response.splitlines():
+        split_line:list = line.split()
+        if len(split_line) < 2 or not split_line[0].startswith("[U:"):
+            continue
+
+        player_name_start:int = len(split_line[0]) + len(split_line[1]) + 2
+        player_data[split_line[0]] = PlayerInfo(line[player_name_start:], split_line[0], split_line[1])
+    
+    return player_data
+
+def time_per_call(func, iterations:int) -> float:
+    start:float = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    
+    return (time.perf_counter() - start) / iterations
+
+# Same class with a __dict__, what everything looked like before slots
+def dict_backed(cls) -> type:
+    return type(cls.__name__, (cls,), {})
+
+# Only counts the instances themselves, arguments are built and interned up front
+def measure_instances(cls, arguments:list) -> float:
+    tracemalloc.start()
+    before:int = tracemalloc.get_traced_memory()[0]
+    instances:list = [cls(*args) for args in arguments]
+    after:int = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    del instances
+    return (after - before) / len(arguments)
+
+def measure_ticks(tick, ticks:int) -> tuple:
+    tracemalloc.start()
+    start:float = time.perf_counter()
+
+    for _ in range(ticks):
+        tick()
+
+    elapsed:float = time.perf_counter() - start
+    peak:int = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return peak, elapsed / ticks
+
+def bench_alloc(args) -> None:
+    print(f"Bytes per instance ({args.count} instances):")
+
+    networkids:list = [sys.intern(f"[U:1:{i}]") for i in range(args.count)]
+    names:list = [f"Tester {i}" for i in range(args.count)]
+
+    models:list = [
+        (Tester, [(networkids[i], names[i], 0, JoinStatus.CONNECTED) for i in range(args.count)]),
+        (PlayerInfo, [(names[i], networkids[i], i) for i in range(args.count)]),
+        (PlayerJoinStatus, [(names[i], networkids[i], JoinStatus.CONNECTED) for i in range(args.count)])
+    ]
+
+    for cls, arguments in models:
+        slotted:float = measure_instances(cls, arguments)
+        unslotted:float = measure_instances(dict_backed(cls), arguments)
+        print(f"  {cls.__name__:<18} {unslotted:8.1f} => {slotted:8.1f}")
+
+    # Steady state poll, same player list coming back every tick
+    # Fresh copies so the comparison can't short circuit on identity
+    responses:list = [make_player_info_response(args.players).encode().decode() for _ in range(args.ticks)]
+    it = iter(responses)
+
+    state:ServerState = ServerState()
+    state.record_success(responses[0], 0.0)
+
+    reparse_peak, reparse_time = measure_ticks(lambda: parse_player_info(next(it)), args.ticks)
+    it = iter(responses)
+    state_peak, state_time = measure_ticks(lambda: state.record_success(next(it), 0.0), args.ticks)
+
+    print(f"Steady state poll tick ({args.players} players, {args.ticks} ticks):")
+    print(f"  reparse every tick  peak {reparse_peak / 1024:8.1f} KiB  {reparse_time * 1e6:8.1f} us/tick")
+    print(f"  ServerState         peak {state_peak / 1024:8.1f} KiB  {state_time * 1e6:8.1f} us/tick")
+
+def bench_parser(args) -> None:
+    for players in (64, 128):
+        response:str = make_messy_player_info_response(players)
+        assert len(parse_player_info(response)) == players
+
+        split_time:float = time_per_call(lambda: split_parse(response), args.iterations)
+        regex_time:float = time_per_call(lambda: parse_player_info(response), args.iterations)
+        previous:dict = parse_player_info(response)
+        reuse_time:float = time_per_call(lambda: parse_player_info(response, previous), args.iterations)
+
+        print(f"{players} players ({len(response)} bytes):")
+        print(f"  split per line      {split_time * 1e6:8.1f} us")
+        print(f"  parse_player_info   {regex_time * 1e6:8.1f} us")
+        print(f"  with previous       {reuse_time * 1e6:8.1f} us")
+
+    responses:list = [make_messy_player_info_response(64, server * 64) for server in range(args.servers)]
+    assert len(parse_player_infos(responses)) == 64 * args.servers
+
+    separate_time:float = time_per_call(lambda: [parse_player_info(response) for response in responses], args.iterations)
+    bulk_time:float = time_per_call(lambda: parse_player_infos(responses), args.iterations)
+
+    print(f"{args.servers} servers with 64 players each:")
+    print(f"  one by one          {separate_time * 1e6:8.1f} us")
+    print(f"  parse_player_infos  {bulk_time * 1e6:8.1f} us")
+
+def percentile(values:list, fraction:float) -> float:
+    if len(values) == 0:
+        return float("nan")
+
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+def count_fds() -> int:
+    try:
+        return len(os.listdir("/proc/self/fd"))
+    except OSError:
+        return -1 # Not on Linux
+
+# Fake servers run in their own process so their CPU time doesn't end up in our numbers
+async def spawn_fake_servers(args) -> tuple:
+    process:asyncio.subprocess.Process = await asyncio.create_subprocess_exec(
+        sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "fakesrv.py"),
+        "--servers", str(args.servers),
+        "--players", str(args.players),
+        "--latency", str(args.latency),
+        "--jitter", str(args.jitter),
+        "--churn", str(args.churn),
+        "--dead", str(args.dead),
+        stdout=asyncio.subprocess.PIPE
+    )
+
+    return process, json.loads(await process.stdout.readline())
+
+async def run_poll_bench(args) -> None:
+    # Holds off by default so the numbers are detection latency, not the hold time on top of it
+    testing.join_hold = args.join_hold
+    testing.leave_hold = args.leave_hold
+
+    process, cluster = await spawn_fake_servers(args)
+    fds_before:int = count_fds()
+
+    for port in cluster["ports"]:
+        testing.rcon_infos.set(f"127.0.0.1:{port}", RCONInfo("127.0.0.1", port, cluster["password"], "bench"))
+
+    joined_at:dict = {} # networkid => when the fake server let them in
+    left_at:dict = {}
+    join_latencies:list = []
+    leave_latencies:list = []
+    cycles:list = []
+
+    async def read_events():
+        while True:
+            line:bytes = await process.stdout.readline()
+            if len(line) == 0:
+                return
+
+            event:dict = json.loads(line)
+            (joined_at if event["joined"] else left_at)[event["networkid"]] = event["time"]
+
+    # Same bookkeeping handle_task_playtest does, minus Discord
+    async def consume():
+        while True:
+            player_status:PlayerJoinStatus = await testing.player_status_queue.get()
+            now:float = time.time()
+
+            if player_status.status == JoinStatus.CONNECTED:
+                tester:Tester = testing.testers.get(player_status.networkid)
+                if tester is None:
+                    testing.testers.set(player_status.networkid, Tester(player_status.networkid, player_status.name, int(now), JoinStatus.CONNECTED))
+                else:
+                    tester.status = JoinStatus.CONNECTED
+
+                if player_status.networkid in joined_at:
+                    join_latencies.append(now - joined_at.pop(player_status.networkid))
+            else:
+                tester:Tester = testing.testers.get(player_status.networkid)
+                if tester is not None:
+                    tester.status = JoinStatus.DISCONNECTED
+
+                if player_status.networkid in left_at:
+                    leave_latencies.append(now - left_at.pop(player_status.networkid))
+
+    class TimedPoller(RCONPoller):
+        async def poll_cycle(self, infos:list) -> list:
+            if len(infos) == 0:
+                return []
+
+            start:float = time.perf_counter()
+            responses:list = await super().poll_cycle(infos)
+            cycles.append(time.perf_counter() - start)
+            return responses
+
+    testing.player_status_queue = asyncio.Queue()
+    tasks:list = [asyncio.ensure_future(read_events()), asyncio.ensure_future(consume())]
+    poller:TimedPoller = TimedPoller()
+
+    cpu_start:float = time.process_time()
+    poller.start()
+    await asyncio.sleep(args.duration)
+    fds_during:int = count_fds()
+    poller.stop()
+    await poller.join()
+    cpu:float = time.process_time() - cpu_start
+
+    for task in tasks:
+        task.cancel()
+
+    process.terminate()
+    await process.wait()
+
+    print(f"{args.servers} servers ({args.dead} dead), {args.players} players each, churn {args.churn}/s, latency {args.latency}s +-{args.jitter}s, {args.duration}s, holds {args.join_hold:g}s/{args.leave_hold:g}s:")
+    print(f"  poll cycles         {len(cycles)}")
+    print(f"  cycle duration      p50 {percentile(cycles, 0.5) * 1000:8.1f} ms  p95 {percentile(cycles, 0.95) * 1000:8.1f} ms  max {max(cycles, default=0.0) * 1000:8.1f} ms")
+    print(f"  join detection      p50 {percentile(join_latencies, 0.5) * 1000:8.1f} ms  p95 {percentile(join_latencies, 0.95) * 1000:8.1f} ms  ({len(join_latencies)} joins)")
+    print(f"  leave detection     p50 {percentile(leave_latencies, 0.5) * 1000:8.1f} ms  p95 {percentile(leave_latencies, 0.95) * 1000:8.1f} ms  ({len(leave_latencies)} leaves)")
+    print(f"  cpu per cycle       {cpu / max(1, len(cycles)) * 1000:8.2f} ms")
+    print(f"  open fds            {fds_before} before, {fds_during} while polling, {count_fds()} after")
+
+def bench_poll(args) -> None:
+    asyncio.run(run_poll_bench(args))
+
+async def run_rcon_bench(args) -> None:
+    process, cluster = await spawn_fake_servers(args)
+    port:int = cluster["ports"][-1] # Skip past any dead ones
+
+    def blocking():
+        reconnect:list = []
+        for _ in range(args.iterations):
+            start:float = time.perf_counter()
+            client:rcon = rcon("127.0.0.1", port, cluster["password"], silent=True)
+            client.exec_command("player_info")
+            reconnect.append(time.perf_counter() - start)
+            client.close()
+        
+        return reconnect
+
+    # The blocking wrapper runs its own loop, keep it off ours
+    reconnect:list = await asyncio.get_running_loop().run_in_executor(None, blocking)
+
+    client:arcon = arcon("127.0.0.1", port, cluster["password"], silent=True)
+    await client.connect()
+    persistent:list = []
+    for _ in range(args.iterations):
+        start:float = time.perf_counter()
+        await client.exec_command("player_info")
+        persistent.append(time.perf_counter() - start)
+
+    # Richer per tick data, one command after another vs all of them in one write
+    commands:list = ["player_info", "status", "stats"]
+    sequential:list = []
+    pipelined:list = []
+    for _ in range(args.iterations):
+        start:float = time.perf_counter()
+        for command in commands:
+            await client.exec_command(command)
+        sequential.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await client.exec_commands(commands)
+        pipelined.append(time.perf_counter() - start)
+    client.close()
+
+    process.terminate()
+    await process.wait()
+
+    print(f"player_info with {args.players} players, {args.iterations} iterations:")
+    print(f"  rcon, connect every time   p50 {percentile(reconnect, 0.5) * 1000:8.2f} ms  p95 {percentile(reconnect, 0.95) * 1000:8.2f} ms")
+    print(f"  arcon, kept open           p50 {percentile(persistent, 0.5) * 1000:8.2f} ms  p95 {percentile(persistent, 0.95) * 1000:8.2f} ms")
+    print(f"{', '.join(commands)}:")
+    print(f"  one at a time              p50 {percentile(sequential, 0.5) * 1000:8.2f} ms  p95 {percentile(sequential, 0.95) * 1000:8.2f} ms")
+    print(f"  pipelined                  p50 {percentile(pipelined, 0.5) * 1000:8.2f} ms  p95 {percentile(pipelined, 0.95) * 1000:8.2f} ms")
+
+def bench_rcon(args) -> None:
+    asyncio.run(run_rcon_bench(args))
+
+async def run_probe_bench(args) -> None:
+    process, cluster = await spawn_fake_servers(args)
+    live:list = [("127.0.0.1", port) for port in cluster["ports"] if port not in cluster["dead"]]
+    dead:list = [("127.0.0.1", port) for port in cluster["dead"]]
+
+    prober:A2SProber = A2SProber(args.timeout)
+    await prober.start()
+
+    # First pass picks up the challenges, later ones are a single round trip each
+    passes:list = []
+    for _ in range(args.iterations):
+        start:float = time.perf_counter()
+        results:dict = await prober.probe(live)
+        passes.append(time.perf_counter() - start)
+
+    answered:int = sum(1 for info in results.values() if info is not None)
+
+    # How long it takes to find out a server is gone, over UDP vs waiting on an RCON connect
+    a2s_dead:float = float("nan")
+    rcon_dead:float = float("nan")
+    if len(dead) > 0:
+        start = time.perf_counter()
+        await prober.probe(dead)
+        a2s_dead = time.perf_counter() - start
+
+        client:arcon = arcon(*dead[0], cluster["password"], silent=True)
+        start = time.perf_counter()
+        await client.connect()
+        rcon_dead = time.perf_counter() - start
+        client.close()
+
+    prober.close()
+    process.terminate()
+    await process.wait()
+
+    print(f"A2S_INFO over {len(live)} live servers ({answered} answered), {args.iterations} passes, latency {args.latency}s +-{args.jitter}s:")
+    print(f"  first pass (challenge)     {passes[0] * 1000:8.2f} ms")
+    print(f"  whole pass                 p50 {percentile(passes[1:], 0.5) * 1000:8.2f} ms  p95 {percentile(passes[1:], 0.95) * 1000:8.2f} ms")
+    if len(dead) > 0:
+        print(f"{len(dead)} dead servers found out after:")
+        print(f"  A2S_INFO timeout           {a2s_dead * 1000:8.2f} ms")
+        print(f"  RCON connect               {rcon_dead * 1000:8.2f} ms")
+
+def bench_probe(args) -> None:
+    asyncio.run(run_probe_bench(args))
+
+def add_cluster_arguments(parser:argparse.ArgumentParser, servers:int) -> None:
+    parser.add_argument("--servers", type=int, default=servers)
+    parser.add_argument("--players", type=int, default=32)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--churn", type=int, default=0)
+    parser.add_argument("--dead", type=int, default=0)
+
+def main():
+    parser:argparse.ArgumentParser = argparse.ArgumentParser(description="Little Beepo tracker benchmarks")
+    subparsers = parser.add_subparsers(dest="bench", required=True)
+
+    alloc:argparse.ArgumentParser = subparsers.add_parser("alloc", help="Memory per model instance and allocations per poll tick")
+    alloc.add_argument("--count", type=int, default=10000)
+    alloc.add_argument("--players", type=int, default=128)
+    alloc.add_argument("--ticks", type=int, default=200)
+    alloc.set_defaults(func=bench_alloc)
+
+    player_info:argparse.ArgumentParser = subparsers.add_parser("parser", help="player_info parsing over synthetic 64 and 128 player responses")
+    player_info.add_argument("--iterations", type=int, default=2000)
+    player_info.add_argument("--servers", type=int, default=8)
+    player_info.set_defaults(func=bench_parser)
+
+    poll:argparse.ArgumentParser = subparsers.add_parser("poll", help="End to end polling against local fake servers")
+    add_cluster_arguments(poll, 4)
+    poll.add_argument("--duration", type=float, default=10.0)
+    poll.add_argument("--join-hold", type=float, default=0.0, help="Seconds someone has to be seen before their join counts")
+    poll.add_argument("--leave-hold", type=float, default=0.0, help="Seconds someone has to be missing before their leave counts")
+    poll.set_defaults(func=bench_poll)
+
+    round_trip:argparse.ArgumentParser = subparsers.add_parser("rcon", help="RCON round trips against a local fake server")
+    add_cluster_arguments(round_trip, 1)
+    round_trip.add_argument("--iterations", type=int, default=200)
+    round_trip.set_defaults(func=bench_rcon)
+
+    probe:argparse.ArgumentParser = subparsers.add_parser("probe", help="A2S_INFO liveness passes against local fake servers")
+    add_cluster_arguments(probe, 32)
+    probe.add_argument("--iterations", type=int, default=50)
+    probe.add_argument("--timeout", type=float, default=1.0)
+    probe.set_defaults(func=bench_probe)
+
+    args = parser.parse_args()
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
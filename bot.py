@@ -1,15 +1,22 @@
 import time
 import datetime
+import traceback
 import asyncio
-import queue
 import config
+import access
+import commandsync
 import testing
-import locks
+import metrics
+import outbox
+import roster
+import sessions
 import threads
 import random
 import discord
 from discord import app_commands
-from queue import Queue
+from logstream import LogListener
+from worker import PollerProcess
+from changeindex import parse_tags
 
 from testing import (
     JoinStatus,
@@ -17,88 +24,219 @@ from testing import (
     Tester,
     PlayerJoinStatus,
     RCONInfo,
-    RCONThread
+    RCONPoller
 )
 
 intents = discord.Intents.default()
 
+SEARCH_RESULTS_MAX:int = 25
+STOP_WAIT:float = 1.5 # Longest /tstop waits on the poller and friends before replying
+PAGE_VIEW_TIMEOUT:float = 600.0 # /tcl buttons stop working after this long
+
 class aclient(discord.Client):
     def __init__(self):
         super().__init__(intents=intents)
-        self.synced:bool = False
         self.task_playtest:asyncio.Task
+        self.roster:roster.LiveRoster = None
+
+    async def setup_hook(self):
+        sessions.open_store(config.session_db)
+
+        # Doesn't need the gateway, getting it out of the way here means on_ready isn't held up by it
+        dev_guild:discord.Object = discord.Object(id=config.dev_guild_id) if config.dev_guild_id != -1 else None
+        await commandsync.sync(tree, dev_guild, config.force_command_sync)
+
+        if config.metrics_enabled:
+            metrics.enable()
+
+            # Only the scrape endpoint is lost if the port's taken, /tmetrics keeps working
+            if config.metrics_port != 0:
+                try:
+                    await metrics.start_endpoint(config.metrics_port)
+                except OSError as e:
+                    print(f"Failed to start metrics endpoint on port {config.metrics_port}: {e}")
 
     async def on_ready(self):
         await self.wait_until_ready()
-        if not self.synced:
-            await tree.sync(guild=None)
-            self.synced = True
         print(f"We have logged in as {self.user}.")
+
+        await self.resume_session()
+
+    # Coordinator role ID is cached per guild, any role change there might affect it
+    async def on_guild_role_create(self, role:discord.Role):
+        access.invalidate(role.guild)
+
+    async def on_guild_role_update(self, before:discord.Role, after:discord.Role):
+        access.invalidate(after.guild)
+
+    async def on_guild_role_delete(self, role:discord.Role):
+        access.invalidate(role.guild)
+
+    # Picks a test that was still running when the bot went down back up where it left off
+    async def resume_session(self):
+        if sessions.store is None or testing.test_active:
+            return
+
+        active:tuple = await sessions.store.resume()
+        if active is None:
+            return
+
+        started, intervals = active
+        for networkid, name, server, joined, left in intervals:
+            tester:Tester = testing.testers.get(networkid)
+            if tester is None:
+                tester = Tester(networkid, name, joined, JoinStatus.CONNECTED, server)
+                testing.testers.set(networkid, tester)
+
+            # Latest interval wins
+            tester.name = name
+            tester.server = server
+            tester.status = JoinStatus.CONNECTED if left is None else JoinStatus.DISCONNECTED
+            tester.endtime = -1 if left is None else left
+
+        testing.test_active = True
+        self.task_playtest = self.loop.create_task(self.handle_task_playtest())
+        print(f"Resumed test started {datetime.datetime.fromtimestamp(started)} with {len(testing.testers)} testers.")
     
     async def handle_task_playtest(self):
+        # Fresh queue per test, it has to be created on the loop that's going to use it
+        testing.player_status_queue = asyncio.Queue()
 
-        # TODO: It should be possible to ditch using a thread and opt for coroutines with async/await
-        # The issue is the socket API on its own is not asynchronous
+        log_settings:tuple = None
+        if config.log_port != 0:
+            log_settings = (config.log_bind_address, config.log_port, config.log_public_address, config.log_secret)
 
-        msg:str = ''
+        if config.poller_process:
+            # Polls from a child process, keeps the work off our interpreter
+            threads.rcon = PollerProcess(log_settings)
+        else:
+            # Poller runs as a task on our own loop, no thread needed
+            threads.rcon = RCONPoller(LogListener(*log_settings) if log_settings is not None else None)
 
-        threads.rcon = RCONThread()
         threads.rcon.start()
 
+        # Live roster replaces the join/leave posts with a single message that gets edited
+        if config.live_roster and testing.testing_channel_id != -1:
+            self.roster = roster.LiveRoster(self.get_channel(testing.testing_channel_id))
+            self.roster.start()
+
+            for tester in testing.testers.values(): # Anyone brought back by a resumed session
+                self.roster.update(tester)
+
         while testing.test_active:
-            if testing.player_status_queue.qsize() == 0:
-                if len(msg) > 0:
-                    # TODO: We should probably handle message splitting, but hopefully we won't exceed 2000 characters
-                    await self.get_channel(testing.testing_channel_id).send(msg)
-                    msg = ''
-                await asyncio.sleep(1.0)
-                continue
-
-            try:
-                player_status:PlayerJoinStatus = testing.player_status_queue.get_nowait()
-                locks.testers.acquire()
+            # Sleep until the poller has something for us, then take everything it queued up in one go
+            batch:list = [await testing.player_status_queue.get()]
+            while not testing.player_status_queue.empty():
+                batch.append(testing.player_status_queue.get_nowait())
+            
+            metrics.player_status_queue_depth.observe(len(batch))
+
+            msg:str = ''
+            changes:list = [] # Batched into one transaction for the session store
+            now:int = int(time.time())
+
+            player_status:PlayerJoinStatus
+            for player_status in batch:
+                tester:Tester = testing.testers.get(player_status.networkid)
 
                 if player_status.status == JoinStatus.CONNECTED:
                     announce_join:bool = False
+                    moved:bool = False
 
-                    if player_status.networkid not in testing.testers:
-                        testing.testers[player_status.networkid] = Tester(
+                    if tester is None:
+                        tester = Tester(
                             networkid=player_status.networkid,
                             name=player_status.name,
-                            jointime=int(time.time()),
-                            status=JoinStatus.CONNECTED
+                            jointime=now,
+                            status=JoinStatus.CONNECTED,
+                            server=player_status.server
                         )
+                        testing.testers.set(player_status.networkid, tester)
 
                         announce_join = True
                     else:
-                        tester:Tester = testing.testers[player_status.networkid]
                         if tester.status != JoinStatus.CONNECTED:
                             tester.status = JoinStatus.CONNECTED
                             announce_join = True
+                        elif tester.server != player_status.server:
+                            moved = True
+
+                        tester.server = player_status.server
                 
                     if announce_join and testing.testing_channel_id != -1:
                         msg += f"{player_status.name} joined the test.\n"
+
+                    # Moving servers closes one interval and opens another
+                    if moved:
+                        changes.append(("leave", tester.networkid, now))
+                    
+                    if announce_join or moved:
+                        changes.append(("join", tester.networkid, player_status.name, tester.server, now))
                 
                 if player_status.status == JoinStatus.DISCONNECTED:
-                    if player_status.networkid in testing.testers:
-                        tester:Tester = testing.testers[player_status.networkid]
-                        tester.endtime = int(time.time())
+                    if tester is not None:
+                        if tester.status == JoinStatus.CONNECTED:
+                            changes.append(("leave", tester.networkid, now))
+
+                        tester.endtime = now
                         tester.status = JoinStatus.DISCONNECTED
 
                         if testing.testing_channel_id != -1:
                             msg += f"{player_status.name} left the test.\n"
                 
-                locks.testers.release()
-            except queue.Empty:
-                pass
+                if self.roster is not None and tester is not None:
+                    self.roster.update(tester)
+
+            if sessions.store is not None:
+                sessions.store.record(changes)
+
+            if len(msg) > 0 and self.roster is None:
+                # Queued rather than sent, bursts get merged and split to fit
+                outbox.get_outbox(self.get_channel(testing.testing_channel_id)).post(msg)
 
     # have some grease?
     misery_level:int = 0
 
+# Prev/next buttons under /tcl, flipping pages edits the one message
+class ChangeListView(discord.ui.View):
+    def __init__(self):
+        super().__init__(timeout=PAGE_VIEW_TIMEOUT)
+        self.page:int = 0
+        self.count:int = 0
+
+    def render(self) -> str:
+        body, self.page, self.count = testing.test_changes_pages.page(self.page)
+        self.prev.disabled = self.page == 0
+        self.next.disabled = self.page >= self.count - 1
+
+        if self.count == 0:
+            return "Changes to test:\nNone.\n"
+
+        header:str = f"Changes to test (page {self.page + 1}/{self.count}):" if self.count > 1 else "Changes to test:"
+        return f"{header}\n```\n{body}```"
+
+    @discord.ui.button(label="Prev", style=discord.ButtonStyle.secondary)
+    async def prev(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.page -= 1
+        await interaction.response.edit_message(content=self.render(), view=self)
+
+    @discord.ui.button(label="Next", style=discord.ButtonStyle.secondary)
+    async def next(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.page += 1
+        await interaction.response.edit_message(content=self.render(), view=self)
+
 client = aclient()
 
 tree = app_commands.CommandTree(client)
 
+@tree.error
+async def on_tree_error(interaction: discord.Interaction, error: app_commands.AppCommandError):
+    if await access.on_check_failure(interaction, error):
+        return
+
+    print(f"Error in /{interaction.command.name if interaction.command is not None else '?'}:")
+    traceback.print_exception(error)
+
 # /misery
 @tree.command(guild=None, name='misery', description='Increase misery. (Use with care!)')
 async def slash_misery(interaction: discord.Interaction):
@@ -122,197 +260,175 @@ async def slash_givegrease(interaction: discord.Interaction):
 
 # /tcl
 @tree.command(guild=None, name='tcl', description='List changes for next test.')
+@access.testing_channel()
 async def slash_tcl(interaction: discord.Interaction):
-    if interaction.channel_id != testing.testing_channel_id:
-        await interaction.response.send_message(config.msg_bad_channel, ephemeral=True)
-        return
-    
-    await interaction.response.defer()
+    view:ChangeListView = ChangeListView()
+    msg:str = view.render()
 
-    if len(testing.test_changes) == 0:
-        msg = "Changes to test:\nNone.\n"
+    # Nothing to flip through on a single page
+    if view.count <= 1:
+        await interaction.response.send_message(msg)
     else:
-        bSplit = False
-        tag = "```"
-        tagSize = 2 * len(tag)
-        header = "Changes to test:\n"
-        msgMax = 2000 - (len(header) - tagSize)
-        n = 0
-        content = ""
-
-        for x in testing.test_changes:
-            entry = f"{n}. " + x.change + f" (Added by: {x.author})\n"
-            n += 1
+        await interaction.response.send_message(msg, view=view)
 
-            if len(content) + len(entry) >= msgMax:
-                if bSplit == False:
-                    msg = header + tag + content + tag
-                else:
-                    msg = tag + content + tag
+# /tcs
+@tree.command(guild=None, name='tcs', description='Search test changes. Ex: /tcs lighting #maps author:felis')
+@access.testing_channel()
+async def slash_tcs(interaction: discord.Interaction, query: str):
+    ids:list = testing.test_changes_index.search(query)
 
-                await interaction.followup.send(msg, ephemeral=False)
-
-                bSplit = True
-                content = ""
-
-            content += entry
+    if len(ids) == 0:
+        msg = f"No changes matching \"{query}\"."
+    else:
+        entries:list = [testing.test_changes[id].describe() + "\n" for id in ids[:SEARCH_RESULTS_MAX]]
+        msg = f"{len(ids)} changes matching \"{query}\":\n```" + "".join(entries) + "```"
 
-        if bSplit == False:
-            msg = header + tag + content + tag
-        elif len(content) > 0:
-            msg = tag + content + tag
+        if len(ids) > SEARCH_RESULTS_MAX:
+            msg += f"Showing the first {SEARCH_RESULTS_MAX}, narrow it down to see the rest."
 
-    await interaction.followup.send(msg, ephemeral=False)
+    await outbox.respond(interaction, msg)
 
 # /tca
-@tree.command(guild=None, name='tca', description='Add test change. Ex: /tca Modified a model, map, functionality, etc...')
-async def slash_tca(interaction: discord.Interaction, change: str):
-    if interaction.channel_id != testing.testing_channel_id:
-        await interaction.response.send_message(config.msg_bad_channel, ephemeral=True)
-        return
-    
-    new_change = TestChange(change, interaction.user.display_name)
-    testing.test_changes.append(new_change)
-    msg = f"Added change for next test: {new_change.change}"
-
-    testing.save_test_changes()
+@tree.command(guild=None, name='tca', description='Add test change. Ex: /tca Modified a model, map, functionality, etc... maps,lighting')
+@access.testing_channel()
+async def slash_tca(interaction: discord.Interaction, change: str, tags: str = ''):
+    entry:dict = {"op": "add", "change": change, "author": interaction.user.display_name, "tags": list(parse_tags(tags))}
+    testing.record_test_change(entry)
+    msg = f"Added change #{entry['id']} for next test: {change}"
 
     await interaction.response.send_message(msg)
 
 # /tce
-@tree.command(guild=None, name='tce', description='Edit existing test change by list index. Ex: /tce 0 Fix a typo...')
-async def slash_tce(interaction: discord.Interaction, index: int, change: str):
-    if interaction.channel_id != testing.testing_channel_id:
-        await interaction.response.send_message(config.msg_bad_channel, ephemeral=True)
-        return
-
-    if index >= len(testing.test_changes) or index < 0:
-        msg = "Index out of range."
+@tree.command(guild=None, name='tce', description='Edit existing test change by ID. Ex: /tce 12 Fix a typo...')
+@access.testing_channel()
+async def slash_tce(interaction: discord.Interaction, change_id: int, change: str, tags: str = None):
+    entry:dict = {"op": "edit", "id": change_id, "change": change}
+    if tags is not None:
+        entry["tags"] = list(parse_tags(tags))
+
+    if not testing.record_test_change(entry):
+        msg = f"No change #{change_id}."
     else:
-        testing.test_changes[index].change = change
-        msg = f"Edited change #{index}: {testing.test_changes[index].change}"
-    
-    testing.save_test_changes()
+        msg = f"Edited change #{change_id}: {testing.test_changes[change_id].change}"
 
     await interaction.response.send_message(msg)
 
 # /tcr
-@tree.command(guild=None, name='tcr', description='Remove test change by list index. Ex: /tcr 1')
-async def slash_tcr(interaction: discord.Interaction, index: int):
-    if interaction.channel_id != testing.testing_channel_id:
-        await interaction.response.send_message(config.msg_bad_channel, ephemeral=True)
-        return
+@tree.command(guild=None, name='tcr', description='Remove test change by ID. Ex: /tcr 12')
+@access.testing_channel()
+async def slash_tcr(interaction: discord.Interaction, change_id: int):
+    change:TestChange = testing.test_changes.get(change_id)
 
-    if index >= len(testing.test_changes) or index < 0:
-        msg = "Index out of range."
+    if change is None:
+        msg = f"No change #{change_id}."
     else:
-        msg = f"Removed change: {testing.test_changes[index].change}"
-        testing.test_changes.pop(index)
-
-    testing.save_test_changes()
+        msg = f"Removed change: {change.change}"
+        testing.record_test_change({"op": "remove", "id": change_id})
 
     await interaction.response.send_message(msg)
 
 # /tcpurge
 @tree.command(guild=None, name='tcpurge', description='Remove all changes.')
+@access.coordinator()
 async def slash_tcpurge(interaction: discord.Interaction):
-    if interaction.channel_id != testing.testing_channel_id:
-        await interaction.response.send_message(config.msg_bad_channel, ephemeral=True)
-        return
-
-    role = discord.utils.find(lambda r: r.name == config.coordinator_role_name, interaction.guild.roles)
-    if role not in interaction.user.roles:
-        await interaction.response.send_message(config.msg_access_denied, ephemeral=True)
-        return
-
-    testing.test_changes.clear()
+    testing.record_test_change({"op": "purge"})
     msg = "All changes cleared."
 
-    testing.save_test_changes()
-
     await interaction.response.send_message(msg)
 
 # /tstart
 @tree.command(guild=None, name='tstart', description='Start tracking a test.')
+@access.coordinator()
 async def slash_tstart(interaction: discord.Interaction):
-    if interaction.channel_id != testing.testing_channel_id:
-        await interaction.response.send_message(config.msg_bad_channel, ephemeral=True)
-        return
-
-    role = discord.utils.find(lambda r: r.name == config.coordinator_role_name, interaction.guild.roles)
-    if role not in interaction.user.roles:
-        await interaction.response.send_message(config.msg_access_denied, ephemeral=True)
-        return
-
     if testing.test_active == True:
         msg = "Test already active, stop it first."
     else:
         msg = "Test started."
         testing.test_active = True
-        testing.testers.clear() # Shouldn't need locks.testers here
+        testing.testers.clear()
+
+        if sessions.store is not None:
+            await sessions.store.start_session(int(time.time()), [info.display_name() for info in testing.rcon_infos.values()])
+
         client.task_playtest = client.loop.create_task(client.handle_task_playtest())
 
     await interaction.response.send_message(msg)
 
 # /tstop
 @tree.command(guild=None, name='tstop', description='Stop tracking a test.')
+@access.coordinator()
 async def slash_tstop(interaction: discord.Interaction):
-    if interaction.channel_id != testing.testing_channel_id:
-        await interaction.response.send_message(config.msg_bad_channel, ephemeral=True)
+    if testing.test_active == False:
+        await interaction.response.send_message("No test active, start it first.")
         return
 
-    role = discord.utils.find(lambda r: r.name == config.coordinator_role_name, interaction.guild.roles)
-    if role not in interaction.user.roles:
-        await interaction.response.send_message(config.msg_access_denied, ephemeral=True)
-        return
+    # Shutting down can take a few seconds, don't let the interaction expire meanwhile
+    await interaction.response.defer()
 
-    if testing.test_active == False:
-        msg = "No test active, start it first."
-    else:
-        date_object = datetime.date.today()
-        msg = f"Today's test has ended.\nPlayers in attendance for {date_object}\n```\n"
+    testing.test_active = False
 
-        testing.test_active = False
+    try:
+        client.task_playtest.cancel()
+    except:
+        pass
 
-        try:
-            client.task_playtest.cancel()
-        except:
-            pass
+    # Nothing touches the testers once the playtest task is gone, take them and reset for the next test
+    now:int = int(time.time())
+    testers:list = list(testing.testers.values())
+    testing.testers.clear()
+    testing.player_status_queue = asyncio.Queue()
 
-        if threads.rcon.is_alive():
-            threads.rcon.stop()
-            threads.rcon.join()
-        
-        testing.player_status_queue.queue.clear()
+    # Cancelling interrupts whatever RCON I/O the poller has in flight, it only has its bounded cleanup left
+    threads.rcon.stop()
+    shutdown:list = [asyncio.ensure_future(threads.rcon.join())]
 
-        locks.testers.acquire()
-        for x in testing.testers.values():
-            if x.endtime == -1:
-                x.endtime = int(time.time())
+    if client.roster is not None:
+        shutdown.append(asyncio.ensure_future(client.roster.stop()))
+        client.roster = None
 
-            timespent = x.endtime - x.jointime
-            timestr = str(datetime.timedelta(seconds=timespent))
-            msg += f"{x.name} was present for {timestr}\n"
+    if sessions.store is not None:
+        shutdown.append(asyncio.ensure_future(sessions.store.end_session(now)))
 
-        msg += "```"
-        testing.testers.clear()
-        locks.testers.release()
+    msg:str = await client.loop.run_in_executor(None, testing.build_attendance_report, testers, now, datetime.date.today())
 
-    await interaction.response.send_message(msg)
+    # Whatever isn't done by then finishes in the background, the reply doesn't wait on slow servers
+    await asyncio.wait(shutdown, timeout=STOP_WAIT)
 
-# /pingrole
-# hardcoded right now :)
-@tree.command(guild=None, name='pingrole', description='Mention tester role.')
-async def slash_pingrole(interaction: discord.Interaction):
-    if interaction.channel_id != testing.testing_channel_id:
-        await interaction.response.send_message(config.msg_bad_channel, ephemeral=True)
+    await outbox.respond(interaction, msg)
+
+# /tstats
+@tree.command(guild=None, name='tstats', description='Show attendance history. Ex: /tstats 10')
+@access.testing_channel()
+async def slash_tstats(interaction: discord.Interaction, tests: int = 10):
+    if sessions.store is None:
+        await interaction.response.send_message("No session database, attendance isn't being recorded.", ephemeral=True)
         return
 
-    role = discord.utils.find(lambda r: r.name == config.coordinator_role_name, interaction.guild.roles)
-    if role not in interaction.user.roles:
-        await interaction.response.send_message(config.msg_access_denied, ephemeral=True)
+    if tests < 1:
+        await interaction.response.send_message("Need at least 1 test.", ephemeral=True)
         return
 
+    await interaction.response.defer()
+
+    totals, recent = await sessions.store.stats(tests)
+
+    msg:str = "Most time spent testing:\n```\n"
+    for name, seconds, count in totals:
+        msg += f"{name}: {datetime.timedelta(seconds=seconds)} over {count} tests\n"
+    msg += "```" if len(totals) > 0 else "None.\n```"
+
+    msg += f"\nAttendance over the last {tests} tests:\n```\n"
+    for name, count, seconds in recent:
+        msg += f"{name}: {count} tests, {datetime.timedelta(seconds=seconds)}\n"
+    msg += "```" if len(recent) > 0 else "None.\n```"
+
+    await outbox.respond(interaction, msg)
+
+# /pingrole
+# hardcoded right now :)
+@tree.command(guild=None, name='pingrole', description='Mention tester role.')
+@access.coordinator()
+async def slash_pingrole(interaction: discord.Interaction):
     msg:str = ''
 
     for role_id in config.ping_roles:
@@ -323,37 +439,39 @@ async def slash_pingrole(interaction: discord.Interaction):
 
 # /showts
 @tree.command(guild=None, name="showts", description="Show registered test servers")
+@access.testing_channel()
 async def slash_showts(interaction: discord.Interaction):
-    if interaction.channel_id != testing.testing_channel_id:
-        await interaction.response.send_message(config.msg_bad_channel, ephemeral=True)
-        return
-
     msg = f"Currently registered test servers:\n```\n"
-    locks.rcon.acquire()
     rcon_info:RCONInfo
 
-    # TODO: Should maybe add message splitting like test changes
-    # But I doubt we'll ever have that many test servers
+    # No test running, so nothing has asked the servers lately, do a quick A2S pass over all of them
+    polling:bool = threads.rcon.is_alive()
+    probes:dict = {}
+    if not polling and testing.probe_enabled and len(testing.rcon_infos) > 0:
+        await interaction.response.defer()
+        probes = await testing.probe_servers(list(testing.rcon_infos.values()))
+
+    now:float = time.monotonic()
     for rcon_info in testing.rcon_infos.values():
-        msg += f"{rcon_info.address}:{rcon_info.port} => {rcon_info.comment}\n"
+        msg += f"{rcon_info.address}:{rcon_info.port} => {rcon_info.comment}"
 
-    locks.rcon.release()
+        # Show how the poller sees the server while a test is running
+        description:str = threads.rcon.describe_server(rcon_info, now) if polling else None
+        if description is None and rcon_info in probes:
+            description = probes[rcon_info].describe() if probes[rcon_info] is not None else "not answering queries"
+
+        if description is not None:
+            msg += f" ({description})"
+
+        msg += "\n"
 
     msg += "```"
-    await interaction.response.send_message(msg)
+    await outbox.respond(interaction, msg)
 
 # /addts
 @tree.command(guild=None, name="addts", description="Add test server for tracking Ex: /addts ip port \"password\" \"server name\"")
+@access.coordinator()
 async def slash_addts(interaction: discord.Interaction, address:str, port:int, password:str, comment:str):
-    if interaction.channel_id != testing.testing_channel_id:
-        await interaction.response.send_message(config.msg_bad_channel, ephemeral=True)
-        return
-
-    role = discord.utils.find(lambda r: r.name == config.coordinator_role_name, interaction.guild.roles)
-    if role not in interaction.user.roles:
-        await interaction.response.send_message(config.msg_access_denied, ephemeral=True)
-        return
-    
     if len(password) == 0:
         await interaction.response.send_message(f"No password provided", ephemeral=True)
         return
@@ -362,19 +480,13 @@ async def slash_addts(interaction: discord.Interaction, address:str, port:int, p
         await interaction.response.send_message(f"No server name provided", ephemeral=True)
         return
 
-    locks.rcon.acquire()
-    if f"{address}:{port}" in testing.rcon_infos:
-        await interaction.response.send_message(f"{address}:{port} already in server list", ephemeral=True)
-        locks.rcon.release()
-        return
-    
     if port < 0 or port > 65535:
         await interaction.response.send_message(f"{port} is not a valid port", ephemeral=True)
-        locks.rcon.release()
         return
-    
-    testing.rcon_infos[f"{address}:{port}"] = RCONInfo(address, port, password, comment)
-    locks.rcon.release()
+
+    if not testing.rcon_infos.add(f"{address}:{port}", RCONInfo(address, port, password, comment)):
+        await interaction.response.send_message(f"{address}:{port} already in server list", ephemeral=True)
+        return
 
     msg:str = f"Added {address}:{port} => {comment}"
 
@@ -385,27 +497,14 @@ async def slash_addts(interaction: discord.Interaction, address:str, port:int, p
 
 # /remts
 @tree.command(guild=None, name="remts", description="Remove a test server from tracking Ex: /remts ip port")
+@access.coordinator()
 async def slash_remts(interaction: discord.Interaction, address:str, port:int):
-    if interaction.channel_id != testing.testing_channel_id:
-        await interaction.response.send_message(config.msg_bad_channel, ephemeral=True)
-        return
-
-    role = discord.utils.find(lambda r: r.name == config.coordinator_role_name, interaction.guild.roles)
-    if role not in interaction.user.roles:
-        await interaction.response.send_message(config.msg_access_denied, ephemeral=True)
-        return
-
     full_address = f"{address}:{port}"
-    was_removed:bool = False
-    locks.rcon.acquire()
-
-    if full_address in testing.rcon_infos:
-        testing.rcon_infos.pop(full_address)
-        was_removed = True
-    
-    locks.rcon.release()
+    rcon_info:RCONInfo = testing.rcon_infos.pop(full_address)
+    was_removed:bool = rcon_info is not None
 
     if was_removed:
+        testing.rcon_pool.close(rcon_info)
         msg = f"Removed {address}:{port} from test tracking"
 
         if not config.save_config():
@@ -415,6 +514,17 @@ async def slash_remts(interaction: discord.Interaction, address:str, port:int):
     else:
         await interaction.response.send_message(f"{address}:{port} was not found")
 
+# /tmetrics
+@tree.command(guild=None, name="tmetrics", description="Show tracker performance metrics")
+@access.coordinator()
+async def slash_tmetrics(interaction: discord.Interaction):
+    if not metrics.enabled:
+        await interaction.response.send_message("Metrics are off, enable them in config.json.", ephemeral=True)
+        return
+
+    msg:str = "```\n" + "\n".join(metrics.summarize()) + "\n```"
+    await outbox.respond(interaction, msg, ephemeral=True)
+
 # /8ball
 @tree.command(guild=None, name="8ball", description="Ask the magic 8 ball questions")
 async def slash_8ball(interaction: discord.Interaction, question:str):
@@ -501,5 +611,8 @@ def main():
     config.init()
     client.run(config.discord_token)
 
+    # Test change writes are queued on the journal's thread, make sure they're all on disk before we go
+    testing.test_changes_journal.flush()
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,73 @@
+import re
+
+# Inverted index over test changes so /tcs doesn't have to go through every entry
+# Words in the change, tags as "#tag" and author words as "author:word" all map to the IDs that have them
+WORD:re.Pattern = re.compile(r"\w+")
+
+def tokenize(text:str) -> list:
+    return WORD.findall(text.lower())
+
+def parse_tags(text:str) -> tuple:
+    return tuple(dict.fromkeys(tag.lstrip("#").lower() for tag in re.split(r"[,\s]+", text) if len(tag.lstrip("#")) > 0))
+
+def change_terms(change) -> set:
+    terms:set = set(tokenize(change.change))
+    terms.update(f"#{tag}" for tag in change.tags)
+    terms.update(f"author:{word}" for word in tokenize(change.author))
+    return terms
+
+# Query words all have to match, "#tag" only matches tags and "author:name" only authors
+def query_terms(query:str) -> set:
+    terms:set = set()
+
+    for part in query.lower().split():
+        if part.startswith("#"):
+            terms.update(f"#{tag}" for tag in parse_tags(part))
+        elif part.startswith("author:"):
+            terms.update(f"author:{word}" for word in tokenize(part[len("author:"):]))
+        else:
+            terms.update(tokenize(part))
+
+    return terms
+
+class ChangeIndex:
+    def __init__(self) -> None:
+        self.postings:dict = {} # term => set of change IDs
+        self.terms:dict = {} # change ID => terms it was indexed under, so removal doesn't need the old text
+
+    def add(self, change) -> None:
+        terms:set = change_terms(change)
+        self.terms[change.id] = terms
+
+        for term in terms:
+            ids:set = self.postings.get(term)
+            if ids is None:
+                ids = self.postings[term] = set()
+            ids.add(change.id)
+
+    def remove(self, change) -> None:
+        for term in self.terms.pop(change.id, ()):
+            ids:set = self.postings[term]
+            ids.discard(change.id)
+            if len(ids) == 0:
+                self.postings.pop(term)
+
+    def clear(self) -> None:
+        self.postings.clear()
+        self.terms.clear()
+
+    # Matching IDs, oldest first
+    def search(self, query:str) -> list:
+        terms:set = query_terms(query)
+        if len(terms) == 0:
+            return []
+
+        # Start from the rarest term so the intersections stay small
+        postings:list = sorted((self.postings.get(term, set()) for term in terms), key=len)
+        ids:set = set(postings[0])
+        for other in postings[1:]:
+            if len(ids) == 0:
+                break
+            ids &= other
+
+        return sorted(ids)
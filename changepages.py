@@ -0,0 +1,84 @@
+import bisect
+
+# /tcl pages, rendered once and kept until something on them changes
+# Lines are cached per change and pages per position, a change only throws away its own line
+# and the pages from just before its own onward, appending to the list only redoes the last couple
+PAGE_LIMIT:int = 1800 # Leaves room for the page header and code block in one message
+
+class ChangePages:
+    def __init__(self, changes:dict) -> None:
+        self.changes = changes # ID => TestChange, in ID order
+        self.lines:dict = {} # ID => rendered line
+        self.pages:list = [] # Rendered page bodies
+        self.firsts:list = [] # First ID on every page, sorted since IDs only go up
+        self.valid:int = 0 # Pages before this one are up to date
+        self.stale:bool = True
+
+    def line(self, change) -> str:
+        line:str = self.lines.get(change.id)
+        if line is None:
+            line = change.describe()
+            if len(line) >= PAGE_LIMIT:
+                line = line[:PAGE_LIMIT - 4] + "..."
+            line = self.lines[change.id] = line + "\n"
+
+        return line
+
+    def invalidate(self, id:int) -> None:
+        self.lines.pop(id, None)
+
+        # The page before can change too, it might fit what now starts this page
+        self.valid = min(self.valid, max(0, bisect.bisect_right(self.firsts, id) - 2))
+        self.stale = True
+
+    def clear(self) -> None:
+        self.lines.clear()
+        self.pages.clear()
+        self.firsts.clear()
+        self.valid = 0
+        self.stale = True
+
+    def build(self) -> list:
+        if not self.stale:
+            return self.pages
+
+        ids:list = list(self.changes)
+        start:int = 0
+        if self.valid < len(self.firsts):
+            start = bisect.bisect_left(ids, self.firsts[self.valid])
+        else:
+            self.valid = 0
+
+        del self.pages[self.valid:]
+        del self.firsts[self.valid:]
+
+        body:list = []
+        size:int = 0
+        for id in ids[start:]:
+            line:str = self.line(self.changes[id])
+            if size + len(line) > PAGE_LIMIT and len(body) > 0:
+                self.pages.append("".join(body))
+                body.clear()
+                size = 0
+
+            if len(body) == 0:
+                self.firsts.append(id)
+
+            body.append(line)
+            size += len(line)
+
+        if len(body) > 0:
+            self.pages.append("".join(body))
+
+        self.valid = len(self.pages)
+        self.stale = False
+        return self.pages
+
+    # Returns (page body, page number clamped to what exists, page count)
+    def page(self, number:int) -> tuple:
+        pages:list = self.build()
+        if len(pages) == 0:
+            return '', 0, 0
+
+        number = min(max(0, number), len(pages) - 1)
+        return pages[number], number, len(pages)
@@ -0,0 +1,60 @@
+import os
+import json
+import hashlib
+import discord
+from discord import app_commands
+
+# Syncing the command tree is slow and heavily rate limited, so only do it when the commands actually changed
+# The hash of everything Discord gets told about each command is kept per scope and compared on startup
+FINGERPRINT_FILE_NAME:str = "command_fingerprints.json"
+
+def fingerprint(tree:app_commands.CommandTree, guild:discord.Object = None) -> str:
+    payloads:list = []
+    for command in tree.get_commands(guild=guild):
+        try:
+            payloads.append(command.to_dict(tree))
+        except TypeError:
+            payloads.append(command.to_dict()) # discord.py before 2.4
+
+    payloads.sort(key=lambda payload: payload["name"])
+    return hashlib.sha256(json.dumps(payloads, sort_keys=True).encode()).hexdigest()
+
+def load_fingerprints() -> dict:
+    try:
+        with open(FINGERPRINT_FILE_NAME, 'r') as file:
+            return json.load(file)
+    except (IOError, ValueError):
+        return {}
+
+def save_fingerprints(fingerprints:dict) -> None:
+    try:
+        with open(FINGERPRINT_FILE_NAME + ".tmp", 'w') as file:
+            file.write(json.dumps(fingerprints, indent=4))
+        os.replace(FINGERPRINT_FILE_NAME + ".tmp", FINGERPRINT_FILE_NAME)
+    except OSError as e:
+        print(f"Failed to save command fingerprints: {e}")
+
+# guild syncs to just that guild, which shows up instantly and is meant for development
+# Returns whether a sync actually happened
+async def sync(tree:app_commands.CommandTree, guild:discord.Object = None, force:bool = False) -> bool:
+    if guild is not None:
+        tree.copy_global_to(guild=guild)
+
+    scope:str = "global" if guild is None else f"guild:{guild.id}"
+    current:str = fingerprint(tree, guild)
+    fingerprints:dict = load_fingerprints()
+
+    if not force and fingerprints.get(scope) == current:
+        print(f"Commands unchanged, skipping {scope} sync.")
+        return False
+
+    try:
+        await tree.sync(guild=guild)
+    except discord.HTTPException as e:
+        print(f"Failed to sync commands ({scope}): {e}") # Fingerprint isn't saved, next start tries again
+        return False
+
+    fingerprints[scope] = current
+    save_fingerprints(fingerprints)
+    print(f"Synced commands ({scope}).")
+    return True
@@ -1,6 +1,5 @@
 import os
 import json
-import locks
 import testing
 from testing import (
     RCONInfo
@@ -9,16 +8,37 @@ from testing import (
 CONFIG_FILE_NAME = "config.json"
 
 discord_token:str = os.getenv("DISCORD_TOKEN")
+force_command_sync:bool = os.getenv("FORCE_COMMAND_SYNC", "0") not in ("", "0") # Sync commands even if they look unchanged
+dev_guild_id:int = -1 # Sync commands to only this guild, they show up there instantly
 
-# TODO: Move to config?
 coordinator_role_name:str = "Test Coordinator"
+channel_id:int = -1 # Overrides PLAYTEST_CHANNELID when set
 
 msg_access_denied:str = "You have no access to this command."
 msg_bad_channel:str = "Command not allowed in this channel."
 
 ping_roles:list = []
 
+# Push mode, servers send us their logs with logaddress_add instead of us polling player_info every second
+log_port:int = 0 # 0 disables it
+log_bind_address:str = "0.0.0.0"
+log_public_address:str = '' # Address the game servers can reach us on
+log_secret:str = '' # Matches sv_logsecret on the servers, if set
+
+session_db:str = "sessions.db" # SQLite attendance history
+
+poller_process:bool = False # Poll from a separate supervised process instead of the bot's loop
+
+live_roster:bool = False # Edit one roster message during tests instead of posting every join and leave
+
+metrics_enabled:bool = False
+metrics_port:int = 0 # Prometheus text endpoint on localhost, 0 to only have /tmetrics
+
 def load_config() -> None:
+    global log_port, log_bind_address, log_public_address, log_secret
+    global metrics_enabled, metrics_port, live_roster, session_db
+    global coordinator_role_name, channel_id, dev_guild_id, poller_process
+
     try:
         # TODO: Perhaps move the above environment variable stuff to this config?
         file = open(CONFIG_FILE_NAME, 'r')
@@ -32,18 +52,49 @@ def load_config() -> None:
         for rcon_info in data["rcon"]:
             # Append RCON information instead of creating an instance of 'rcon'
             # As we don't know when a server is gonna go offline
-            # NOTE: Don't need rcon lock here, we're starting up
             address:str = rcon_info["address"]
             port:int = int(rcon_info["port"])
             password:str = rcon_info["password"]
             comment:str = rcon_info["comment"]
 
-            testing.rcon_infos[f"{address}:{port}"] = RCONInfo(
+            testing.rcon_infos.set(f"{address}:{port}", RCONInfo(
                 address,
                 port,
                 password,
                 comment
-            )
+            ))
+        
+        if "logaddress" in data:
+            logaddress:dict = data["logaddress"]
+            log_port = int(logaddress["port"])
+            log_bind_address = logaddress.get("bind", log_bind_address)
+            log_public_address = logaddress["public"]
+            log_secret = logaddress.get("secret", log_secret)
+        
+        coordinator_role_name = data.get("coordinatorrole", coordinator_role_name)
+        channel_id = int(data.get("channelid", channel_id))
+        if channel_id != -1:
+            testing.testing_channel_id = channel_id
+
+        dev_guild_id = int(data.get("devguild", dev_guild_id))
+        live_roster = bool(data.get("liveroster", live_roster))
+        poller_process = bool(data.get("pollerprocess", poller_process))
+        session_db = data.get("sessiondb", session_db)
+
+        if "reconcile" in data:
+            reconcile:dict = data["reconcile"]
+            testing.failure_grace = int(reconcile.get("failuregrace", testing.failure_grace))
+            testing.failure_grace_time = float(reconcile.get("failuregracetime", testing.failure_grace_time))
+            testing.join_hold = float(reconcile.get("joinhold", testing.join_hold))
+            testing.leave_hold = float(reconcile.get("leavehold", testing.leave_hold))
+
+        if "probe" in data:
+            testing.probe_enabled = bool(data["probe"].get("enabled", testing.probe_enabled))
+            testing.probe_timeout = float(data["probe"].get("timeout", testing.probe_timeout))
+
+        if "metrics" in data:
+            metrics_enabled = bool(data["metrics"].get("enabled", True))
+            metrics_port = int(data["metrics"].get("port", 0))
 
     except IOError as e:
         print(f"Failed to load config.json: {e}")
@@ -53,14 +104,17 @@ def load_config() -> None:
 def save_config() -> bool:
     config:dict = {
         "rcon": [],
-        "pingroles": ping_roles
+        "pingroles": ping_roles,
+        "coordinatorrole": coordinator_role_name,
+        "liveroster": live_roster,
+        "pollerprocess": poller_process,
+        "sessiondb": session_db
     }
 
     rcon_list:list = config["rcon"]
 
-    locks.rcon.acquire()
     rcon_info:RCONInfo
-    for rcon_info in testing.rcon_infos.values():
+    for rcon_info in testing.rcon_infos.snapshot().values():
         rcon_list.append(
             {
                 "address": rcon_info.address,
@@ -69,7 +123,38 @@ def save_config() -> bool:
                 "comment": rcon_info.comment
             }
         )
-    locks.rcon.release()
+
+    if log_port != 0:
+        config["logaddress"] = {
+            "port": log_port,
+            "bind": log_bind_address,
+            "public": log_public_address,
+            "secret": log_secret
+        }
+    
+    if channel_id != -1:
+        config["channelid"] = channel_id
+
+    if dev_guild_id != -1:
+        config["devguild"] = dev_guild_id
+
+    config["reconcile"] = {
+        "failuregrace": testing.failure_grace,
+        "failuregracetime": testing.failure_grace_time,
+        "joinhold": testing.join_hold,
+        "leavehold": testing.leave_hold
+    }
+
+    config["probe"] = {
+        "enabled": testing.probe_enabled,
+        "timeout": testing.probe_timeout
+    }
+
+    if metrics_enabled:
+        config["metrics"] = {
+            "enabled": metrics_enabled,
+            "port": metrics_port
+        }
 
     try:
         file = open(CONFIG_FILE_NAME, 'w')
@@ -83,4 +168,8 @@ def save_config() -> bool:
 
 def init() -> None:
     load_config()
+
+    if testing.testing_channel_id == -1:
+        print("WARNING: No channel ID specified to forward playtest messages to, set PLAYTEST_CHANNELID or channelid in config.json.")
+
     testing.load_test_changes()
@@ -0,0 +1,290 @@
+import json
+import time
+import random
+import struct
+import asyncio
+import argparse
+from rcon import (
+    PACKET_HEADER,
+    SERVERDATA_AUTH,
+    SERVERDATA_AUTH_RESPONSE,
+    SERVERDATA_EXECCOMMAND,
+    SERVERDATA_RESPONSE_VALUE,
+    PACKETID_INVALID,
+    packet
+)
+from logstream import format_packet
+from a2s import (
+    A2S_INFO_REQUEST,
+    ServerInfo,
+    format_info,
+    format_challenge
+)
+
+# Stand-in Source dedicated servers, speaks just enough RCON and A2S_INFO for the tracker and the benchmarks
+# python3 fakesrv.py --servers 4 --players 32 --churn 2 prints the ports it listens on, then one line per join/leave
+
+RESPONSE_CHUNK_SIZE:int = 4096 # Source splits responses into bodies of at most this many bytes
+
+# Answers A2S_INFO on the same port as RCON like a real server, challenge first
+class QueryProtocol(asyncio.DatagramProtocol):
+    def __init__(self, server) -> None:
+        self.server = server
+        self.transport:asyncio.DatagramTransport = None
+
+    def connection_made(self, transport:asyncio.DatagramTransport) -> None:
+        self.transport = transport
+
+    def datagram_received(self, data:bytes, addr:tuple) -> None:
+        if self.server.dead or not data.startswith(A2S_INFO_REQUEST):
+            return
+
+        if data[len(A2S_INFO_REQUEST):] != self.server.challenge:
+            reply:bytes = format_challenge(self.server.challenge)
+        else:
+            reply:bytes = format_info(ServerInfo("Fake Server", self.server.map, "tf", "Team Fortress", len(self.server.players), 32, 0))
+
+        delay:float = max(0.0, self.server.latency + random.uniform(-self.server.jitter, self.server.jitter))
+        asyncio.get_running_loop().call_later(delay, self.transport.sendto, reply, addr)
+
+class FakeServer:
+    def __init__(self, password:str, players:int, latency:float = 0.0, jitter:float = 0.0, dead:bool = False, on_event = None) -> None:
+        self.password = password
+        self.latency = latency
+        self.jitter = jitter
+        self.dead = dead # Accepts connections and never answers, like a hung server behind a firewall
+        self.on_event = on_event # (networkid, joined) => None
+        self.players:dict = {} # networkid => (userid, name)
+        self.next_userid:int = 2
+        self.server:asyncio.AbstractServer = None
+        self.query_transport:asyncio.DatagramTransport = None
+        self.port:int = 0
+        self.map:str = "ctf_fake"
+        self.challenge:bytes = random.randbytes(4)
+        self.log_addresses:list = [] # (host, port) from logaddress_add
+        self.logging:bool = False
+
+        for _ in range(players):
+            self.join()
+
+    def join(self) -> str:
+        userid:int = self.next_userid
+        self.next_userid += 1
+
+        networkid:str = f"[U:1:{random.randint(1, 2 ** 31)}]"
+        self.players[networkid] = (userid, f"Fake Tester {userid}")
+
+        if self.on_event is not None:
+            self.on_event(networkid, True)
+
+        self.log(f'"Fake Tester {userid}<{userid}><{networkid}><>" connected, address "127.0.0.1:27005"')
+        return networkid
+
+    def leave(self) -> None:
+        if len(self.players) == 0:
+            return
+
+        networkid:str = random.choice(list(self.players))
+        userid, name = self.players.pop(networkid)
+        self.log(f'"{name}<{userid}><{networkid}><>" disconnected (reason "Disconnect by user.")')
+
+        if self.on_event is not None:
+            self.on_event(networkid, False)
+
+    def churn(self, count:int) -> None:
+        for _ in range(count):
+            self.leave()
+            self.join()
+
+    def player_info(self) -> str:
+        return "".join(f"{networkid} {userid} {name}\n" for networkid, (userid, name) in self.players.items())
+
+    # Sent from the game port like a real server, that's where the tracker expects them from
+    def log(self, line:str) -> None:
+        if not self.logging or self.dead or self.query_transport is None:
+            return
+
+        data:bytes = format_packet(time.strftime("L %m/%d/%Y - %H:%M:%S: ") + line)
+        for address in self.log_addresses:
+            self.query_transport.sendto(data, address)
+
+    def execute(self, command:str) -> str:
+        if command.startswith("logaddress_add ") or command.startswith("logaddress_del "):
+            host, _, port = command.split(" ", 1)[1].strip().rpartition(":")
+            if len(host) == 0 or not port.isdigit():
+                return f"{command.split(' ')[0]}:  unparseable address\n"
+
+            address:tuple = (host, int(port))
+            if command.startswith("logaddress_add "):
+                if address not in self.log_addresses:
+                    self.log_addresses.append(address)
+            elif address in self.log_addresses:
+                self.log_addresses.remove(address)
+
+            return f"{command.split(' ')[0]}:  {host}:{port}\n"
+
+        if command == "log on":
+            self.logging = True
+            self.log('Log file started (file "logs/L0000000.log") (game "tf") (version "1")')
+            return "Server logging enabled.\n"
+
+        if command == "player_info":
+            return self.player_info()
+
+        if command == "status":
+            return f"hostname: Fake Server\nplayers : {len(self.players)} humans, 0 bots (32 max)\n"
+
+        if command == "stats":
+            return f"CPU    In (KB/s)  Out (KB/s)  Uptime  Map changes  FPS      Players  Connects\n0.00   0.00       0.00        1       0            66.67    {len(self.players)}        0\n"
+
+        return f"Unknown command \"{command}\"\n"
+
+    async def start(self, host:str = "127.0.0.1", port:int = 0) -> int:
+        self.server = await asyncio.start_server(self.handle, host, port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        self.query_transport, _ = await asyncio.get_running_loop().create_datagram_endpoint(lambda: QueryProtocol(self), local_addr=(host, self.port))
+        return self.port
+
+    def close(self) -> None:
+        if self.server is not None:
+            self.server.close()
+
+        if self.query_transport is not None:
+            self.query_transport.close()
+
+    # Latency is counted from when the request came in, so pipelined requests overlap like they would over a real network
+    # Replies still go out in order, each one waits for the one before it
+    def respond(self, writer:asyncio.StreamWriter, data:bytes, received:float, previous:asyncio.Task, delay:bool = True) -> asyncio.Task:
+        async def send():
+            if previous is not None:
+                await previous
+
+            if delay and (self.latency > 0.0 or self.jitter > 0.0):
+                due:float = received + max(0.0, self.latency + random.uniform(-self.jitter, self.jitter))
+                await asyncio.sleep(max(0.0, due - asyncio.get_running_loop().time()))
+
+            if not writer.is_closing():
+                writer.write(data)
+                await writer.drain()
+
+        return asyncio.get_running_loop().create_task(send())
+
+    async def handle(self, reader:asyncio.StreamReader, writer:asyncio.StreamWriter) -> None:
+        authorized:bool = False
+        reply:asyncio.Task = None # Last reply queued on this connection
+
+        try:
+            while True:
+                size:int = int.from_bytes(await reader.readexactly(4), "little", signed=True)
+                data:bytes = await reader.readexactly(size)
+                received:float = asyncio.get_running_loop().time()
+                id, type = struct.unpack_from("<ii", data)
+                body:str = data[8:-2].decode("utf-8", "replace")
+
+                if self.dead:
+                    continue
+
+                if type == SERVERDATA_AUTH:
+                    authorized = body == self.password
+                    reply = self.respond(writer,
+                        packet(id, SERVERDATA_RESPONSE_VALUE, '').to_bytes() +
+                        packet(id if authorized else PACKETID_INVALID, SERVERDATA_AUTH_RESPONSE, '').to_bytes(),
+                        received, reply
+                    )
+                elif not authorized:
+                    break # Real servers drop unauthorized connections too
+                elif type == SERVERDATA_EXECCOMMAND:
+                    response:bytes = self.execute(body).encode()
+                    chunks:list = [response[i:i + RESPONSE_CHUNK_SIZE] for i in range(0, len(response), RESPONSE_CHUNK_SIZE)] or [b'']
+
+                    # Build the packets by hand, chunks can end halfway through a multibyte character
+                    reply = self.respond(writer, b''.join(
+                        PACKET_HEADER.pack(len(chunk) + 10, id, SERVERDATA_RESPONSE_VALUE) + chunk + b'\0\0'
+                        for chunk in chunks
+                    ), received, reply)
+                elif type == SERVERDATA_RESPONSE_VALUE:
+                    # Mirror it back followed by the junk packet SRCDS sends after it
+                    # No extra latency, it's queued right behind whatever it was sent after
+                    reply = self.respond(writer,
+                        packet(id, SERVERDATA_RESPONSE_VALUE, '').to_bytes() +
+                        PACKET_HEADER.pack(14, id, SERVERDATA_RESPONSE_VALUE) + b'\0\x01\0\0\0\0',
+                        received, reply, delay=False
+                    )
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            if reply is not None:
+                reply.cancel()
+            writer.close()
+
+class FakeCluster:
+    def __init__(self, servers:int, players:int, latency:float = 0.0, jitter:float = 0.0, dead:int = 0, password:str = "fake", on_event = None) -> None:
+        self.password = password
+        self.servers:list = [
+            FakeServer(password, players if i >= dead else 0, latency, jitter, i < dead, on_event)
+            for i in range(servers)
+        ]
+        self.churn_task:asyncio.Task = None
+
+    async def start(self, host:str = "127.0.0.1") -> list:
+        return [await server.start(host) for server in self.servers]
+
+    # Every interval, swap count players out for new ones on every live server
+    def start_churn(self, count:int, interval:float = 1.0) -> None:
+        async def churn_forever():
+            while True:
+                await asyncio.sleep(interval)
+                for server in self.servers:
+                    if not server.dead:
+                        server.churn(count)
+
+        if count > 0:
+            self.churn_task = asyncio.get_running_loop().create_task(churn_forever())
+
+    def close(self) -> None:
+        if self.churn_task is not None:
+            self.churn_task.cancel()
+
+        for server in self.servers:
+            server.close()
+
+
+async def serve(args) -> None:
+    def on_event(networkid:str, joined:bool) -> None:
+        print(json.dumps({"networkid": networkid, "joined": joined, "time": time.time()}), flush=True)
+
+    cluster:FakeCluster = FakeCluster(args.servers, args.players, args.latency, args.jitter, args.dead, args.password)
+    ports:list = await cluster.start(args.host)
+
+    # Initial players aren't reported as joins, announce the ports first
+    print(json.dumps({"ports": ports, "dead": ports[:args.dead], "password": args.password}), flush=True)
+
+    for server in cluster.servers:
+        server.on_event = on_event
+
+    cluster.start_churn(args.churn, args.churn_interval)
+
+    try:
+        await asyncio.Event().wait()
+    finally:
+        cluster.close()
+
+def main():
+    parser:argparse.ArgumentParser = argparse.ArgumentParser(description="Stand-in Source RCON servers")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--servers", type=int, default=1)
+    parser.add_argument("--players", type=int, default=32, help="Players per server")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds before every reply")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Up to this many seconds added to or taken off the latency")
+    parser.add_argument("--churn", type=int, default=0, help="Players swapped out per server every churn interval")
+    parser.add_argument("--churn-interval", type=float, default=1.0)
+    parser.add_argument("--dead", type=int, default=0, help="How many of the servers never answer")
+    parser.add_argument("--password", default="fake")
+
+    try:
+        asyncio.run(serve(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+import os
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+# Snapshot file plus an append-only log of everything done since it was written
+# Appending costs one short line no matter how big the data is, every compact_every entries
+# the snapshot gets rewritten and the log starts over
+# All file I/O happens on one worker thread in submission order, callers never wait on the disk
+class Journal:
+    def __init__(self, snapshot_path:str, journal_path:str, compact_every:int = 256) -> None:
+        self.snapshot_path = snapshot_path
+        self.journal_path = journal_path
+        self.compact_every = compact_every
+        self.seq:int = 0 # Last entry handed out, the snapshot records which one it includes
+        self.entries:int = 0 # Entries in the log since the last compaction
+        self.executor:ThreadPoolExecutor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="journal")
+        self.file = None # Only touched by the worker
+
+    # Returns the snapshot (or None) and the entries logged after it
+    # Only meant for startup, this does block
+    def load(self) -> tuple:
+        snapshot:dict = None
+        entries:list = []
+        snapshot_seq:int = 0
+
+        try:
+            with open(self.snapshot_path, 'r') as file:
+                snapshot = json.load(file)
+                snapshot_seq = int(snapshot.get("seq", 0)) # Files from before the journal have none
+        except IOError:
+            pass # No snapshot yet
+
+        try:
+            with open(self.journal_path, 'rb') as file:
+                good:int = 0 # Bytes of complete entries
+                for line in file:
+                    try:
+                        if not line.endswith(b"\n"):
+                            raise ValueError
+                        entry:dict = json.loads(line)
+                    except ValueError:
+                        break # Torn write from a crash, nothing valid comes after it
+
+                    good += len(line)
+
+                    # Entries can still be in the log if we crashed between writing the snapshot and truncating
+                    if entry["seq"] > snapshot_seq:
+                        entries.append(entry)
+            
+            # Cut the torn bit off or new entries would get glued onto it
+            if good < os.path.getsize(self.journal_path):
+                os.truncate(self.journal_path, good)
+        except IOError:
+            pass
+
+        self.seq = entries[-1]["seq"] if len(entries) > 0 else snapshot_seq
+        self.entries = len(entries)
+
+        return snapshot, entries
+
+    # snapshot is called right away when it's time to compact, so it has to return the state including this entry
+    def append(self, entry:dict, snapshot) -> None:
+        self.seq += 1
+        entry["seq"] = self.seq
+        self.executor.submit(self.write_entry, json.dumps(entry) + "\n")
+
+        self.entries += 1
+        if self.entries >= self.compact_every:
+            self.compact(snapshot())
+
+    # data has to be a copy nobody else touches, it's turned into JSON on the worker so the caller doesn't pay for it
+    def compact(self, data:dict) -> None:
+        data["seq"] = self.seq
+        self.entries = 0
+        self.executor.submit(self.write_snapshot, data)
+
+    # Waits for everything submitted so far to hit the disk
+    def flush(self) -> None:
+        self.executor.submit(lambda: None).result()
+
+    def write_entry(self, line:str) -> None:
+        try:
+            if self.file is None:
+                self.file = open(self.journal_path, 'a')
+
+            self.file.write(line)
+            self.file.flush()
+            os.fsync(self.file.fileno())
+        except OSError as e:
+            print(f"Failed to write to {self.journal_path}: {e}")
+
+    def write_snapshot(self, data:dict) -> None:
+        temp_path:str = self.snapshot_path + ".tmp"
+        text:str = json.dumps(data, indent=4)
+
+        try:
+            with open(temp_path, 'w') as file:
+                file.write(text)
+                file.flush()
+                os.fsync(file.fileno())
+
+            # Readers only ever see the old snapshot or the new one, never half of one
+            os.replace(temp_path, self.snapshot_path)
+
+            directory:int = os.open(os.path.dirname(os.path.abspath(self.snapshot_path)), os.O_RDONLY)
+            try:
+                os.fsync(directory)
+            finally:
+                os.close(directory)
+
+            # Everything in the log is in the snapshot now
+            if self.file is not None:
+                self.file.close()
+            self.file = open(self.journal_path, 'w')
+        except OSError as e:
+            print(f"Failed to write {self.snapshot_path}: {e}")
@@ -0,0 +1,113 @@
+import re
+import sys
+import socket
+import asyncio
+from testing import (
+    JoinStatus,
+    PlayerInfo
+)
+
+# Source log packets look like \xff\xff\xff\xff R L 10/18/2026 - 20:01:02: ...\n\0
+# or with sv_logsecret set, \xff\xff\xff\xff S <secret> L ...
+LOG_PACKET_HEADER:bytes = b'\xff\xff\xff\xff'
+LOG_PACKET_PLAIN:int = ord('R')
+LOG_PACKET_SECRET:int = ord('S')
+
+# L 10/18/2026 - 20:01:02: "Name<12><[U:1:1234]><Team>" connected, address "..."
+# Anchored to the start of the line and the name stops at the first player record, so text players get into
+# the line themselves (chat, names) can't pass for a join or leave, the event has to follow that first record
+LOG_PLAYER_RECORD:str = r'<-?\d+><\[U:\d+:\d+\]><[^>]*>"'
+LOG_PLAYER_EVENT:re.Pattern = re.compile(
+    r'L \d\d/\d\d/\d{4} - \d\d:\d\d:\d\d: "(?P<name>(?:(?!' + LOG_PLAYER_RECORD + r').)*)'
+    r'<(?P<userid>-?\d+)><(?P<networkid>\[U:\d+:\d+\])><[^>]*>" (?P<event>connected|disconnected)\b'
+)
+
+def parse_packet(data:bytes, secret:str = '') -> str:
+    if not data.startswith(LOG_PACKET_HEADER) or len(data) < 6:
+        return None
+
+    kind:int = data[4]
+    if kind == LOG_PACKET_PLAIN:
+        if len(secret) > 0:
+            return None # We want a secret, anybody could have sent this
+        body:bytes = data[5:]
+    elif kind == LOG_PACKET_SECRET:
+        line_start:int = data.find(b'L ', 5)
+        if line_start == -1 or data[5:line_start].decode("utf-8", "replace") != secret:
+            return None
+        body = data[line_start:]
+    else:
+        return None
+
+    return body.rstrip(b'\0\n').decode("utf-8", "replace")
+
+def parse_log_line(line:str) -> tuple:
+    match:re.Match = LOG_PLAYER_EVENT.match(line)
+    if match is None:
+        return None
+
+    status:JoinStatus = JoinStatus.CONNECTED if match["event"] == "connected" else JoinStatus.DISCONNECTED
+    return status, PlayerInfo(match["name"], match["networkid"], int(match["userid"]))
+
+def format_packet(line:str, secret:str = '') -> bytes:
+    if len(secret) > 0:
+        return LOG_PACKET_HEADER + b'S' + secret.encode() + line.encode() + b'\n\0'
+
+    return LOG_PACKET_HEADER + b'R' + line.encode() + b'\n\0'
+
+class LogProtocol(asyncio.DatagramProtocol):
+    def __init__(self, listener) -> None:
+        self.listener = listener
+
+    def datagram_received(self, data:bytes, addr:tuple) -> None:
+        line:str = parse_packet(data, self.listener.secret)
+        if line is None:
+            return
+
+        if self.listener.on_line is not None:
+            self.listener.on_line(addr)
+
+        event:tuple = parse_log_line(line)
+        if event is not None and self.listener.on_event is not None:
+            self.listener.on_event(addr, event[0], event[1])
+
+# Receives game server logs pushed to us with logaddress_add, so joins and leaves
+# show up as they happen instead of waiting on the next player_info poll
+class LogListener:
+    def __init__(self, bind_address:str, port:int, public_address:str, secret:str = '') -> None:
+        self.bind_address = bind_address
+        self.port = port
+        self.public_address = public_address # What the game servers should send to, we may be behind NAT
+        self.secret = secret
+        self.on_event = None # (addr, JoinStatus, PlayerInfo) => None
+        self.on_line = None # (addr) => None, for every log line that gets through, joins and leaves or not
+        self.transport:asyncio.DatagramTransport = None
+
+    def get_logaddress(self) -> str:
+        return f"{self.public_address}:{self.port}"
+
+    async def start(self) -> None:
+        self.transport, _ = await asyncio.get_running_loop().create_datagram_endpoint(
+            lambda: LogProtocol(self),
+            local_addr=(self.bind_address, self.port)
+        )
+
+        # Port 0 picks a free one, mostly useful offline
+        self.port = self.transport.get_extra_info("sockname")[1]
+
+    def close(self) -> None:
+        if self.transport is not None:
+            self.transport.close()
+            self.transport = None
+
+
+# Stand-in log sender for trying the listener out without a game server
+# python3 logstream.py 127.0.0.1 27115 '"Someone<2><[U:1:1234]><>" connected, address "127.0.0.1:27005"'
+if __name__ == "__main__":
+    if len(sys.argv) < 4:
+        print(f"Usage: {sys.argv[0]} address port line [secret]")
+        sys.exit(1)
+
+    sock:socket.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.sendto(format_packet(f"L 01/01/2000 - 00:00:00: {sys.argv[3]}", sys.argv[4] if len(sys.argv) > 4 else ''), (sys.argv[1], int(sys.argv[2])))
+    sock.close()
@@ -0,0 +1,144 @@
+import bisect
+import asyncio
+import logging
+
+# Counters and histograms for the tracker's hot paths
+# Every method bails out straight away while metrics are off, so instrumented code costs a global lookup and a call
+enabled:bool = False
+
+LATENCY_BUCKETS:tuple = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DEPTH_BUCKETS:tuple = (0, 1, 2, 5, 10, 25, 50, 100, 250)
+
+collectors:list = []
+
+def format_labels(names:tuple, values:tuple) -> str:
+    if len(names) == 0:
+        return ''
+
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(names, values)) + "}"
+
+class Counter:
+    def __init__(self, name:str, help:str, labels:tuple = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.values:dict = {} # label values => count
+        collectors.append(self)
+
+    def inc(self, *labels, amount:float = 1.0) -> None:
+        if not enabled:
+            return
+
+        self.values[labels] = self.values.get(labels, 0.0) + amount
+
+    def render(self) -> str:
+        lines:list = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for labels, value in self.values.items():
+            lines.append(f"{self.name}{format_labels(self.labels, labels)} {value:g}")
+
+        return "\n".join(lines)
+
+    def summarize(self) -> list:
+        return [f"{self.name}{format_labels(self.labels, labels)} {value:g}" for labels, value in self.values.items()]
+
+class Histogram:
+    def __init__(self, name:str, help:str, labels:tuple = (), buckets:tuple = LATENCY_BUCKETS) -> None:
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self.values:dict = {} # label values => [bucket counts..., +Inf count, sum]
+        collectors.append(self)
+
+    def observe(self, value:float, *labels) -> None:
+        if not enabled:
+            return
+
+        counts:list = self.values.get(labels)
+        if counts is None:
+            counts = self.values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    def render(self) -> str:
+        lines:list = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+
+        for labels, counts in self.values.items():
+            cumulative:int = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{format_labels(self.labels + ('le',), labels + (bound,))} {cumulative}")
+
+            lines.append(f"{self.name}_sum{format_labels(self.labels, labels)} {counts[-1]:g}")
+            lines.append(f"{self.name}_count{format_labels(self.labels, labels)} {cumulative}")
+
+        return "\n".join(lines)
+
+    def summarize(self) -> list:
+        lines:list = []
+
+        for labels, counts in self.values.items():
+            count:int = sum(counts[:-1])
+            average:float = counts[-1] / count if count > 0 else 0.0
+            lines.append(f"{self.name}{format_labels(self.labels, labels)} n={count} avg={average:.4g}")
+
+        return lines
+
+def render() -> str:
+    return "\n".join(collector.render() for collector in collectors) + "\n"
+
+def summarize() -> list:
+    lines:list = []
+    for collector in collectors:
+        lines += collector.summarize()
+
+    return lines
+
+
+rcon_connect_seconds:Histogram = Histogram("beepo_rcon_connect_seconds", "TCP connect time per server", ("server",))
+rcon_auth_seconds:Histogram = Histogram("beepo_rcon_auth_seconds", "RCON auth round trip per server", ("server",))
+rcon_command_seconds:Histogram = Histogram("beepo_rcon_command_seconds", "RCON command round trip per server", ("server",))
+rcon_failures:Counter = Counter("beepo_rcon_failures_total", "Failed RCON connects and commands per server", ("server",))
+probe_failures:Counter = Counter("beepo_probe_failures_total", "Unanswered A2S_INFO queries per server", ("server",))
+poll_cycle_seconds:Histogram = Histogram("beepo_poll_cycle_seconds", "Time the poller spends waiting on one cycle")
+player_status_queue_depth:Histogram = Histogram("beepo_player_status_queue_depth", "Events waiting when the playtest task wakes up", buckets=DEPTH_BUCKETS)
+lock_wait_seconds:Histogram = Histogram("beepo_lock_wait_seconds", "Time spent waiting on a registry lock", ("lock",))
+discord_send_seconds:Histogram = Histogram("beepo_discord_send_seconds", "Discord message send latency", ("kind",))
+discord_rate_limits:Counter = Counter("beepo_discord_rate_limits_total", "429s discord.py had to wait out")
+
+
+# discord.py retries rate limited requests itself and only tells the logs about it
+class RateLimitCounter(logging.Handler):
+    def emit(self, record:logging.LogRecord) -> None:
+        if "rate limited" in str(record.msg):
+            discord_rate_limits.inc()
+
+async def handle_scrape(reader:asyncio.StreamReader, writer:asyncio.StreamWriter) -> None:
+    try:
+        # Don't care what was asked for, there's only one thing to serve
+        while (await asyncio.wait_for(reader.readline(), 5.0)) not in (b"\r\n", b"\n", b""):
+            pass
+
+        body:bytes = render().encode()
+        writer.write(
+            b"HTTP/1.1 200 OK\r\n"
+            b"Content-Type: text/plain; version=0.0.4\r\n" +
+            f"Content-Length: {len(body)}\r\n".encode() +
+            b"Connection: close\r\n\r\n" +
+            body
+        )
+        await writer.drain()
+    except (OSError, asyncio.TimeoutError):
+        pass
+    finally:
+        writer.close()
+
+def enable() -> None:
+    global enabled
+    enabled = True
+    logging.getLogger("discord.http").addHandler(RateLimitCounter())
+
+# Prometheus style text endpoint, localhost only unless told otherwise
+async def start_endpoint(port:int, address:str = "127.0.0.1") -> asyncio.AbstractServer:
+    return await asyncio.start_server(handle_scrape, address, port)
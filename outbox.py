@@ -0,0 +1,105 @@
+import time
+import asyncio
+import discord
+import metrics
+
+MESSAGE_LIMIT:int = 2000
+COALESCE_WINDOW:float = 0.5 # Seconds to keep collecting lines before sending
+SEND_RETRIES:int = 3
+FENCE:str = "```"
+
+# Splits on line boundaries so every chunk fits in one Discord message
+# Code blocks cut in half get closed at the end of one chunk and reopened at the start of the next
+def split_message(text:str, limit:int = MESSAGE_LIMIT) -> list:
+    chunks:list = []
+    current:str = ''
+    in_fence:bool = False
+    reserve:int = len(FENCE) + 1 # Room to close a code block we're cut off in
+    reopen:str = FENCE + "\n"
+
+    lines:list = []
+    for line in text.splitlines(keepends=True):
+        # Lines that wouldn't fit even on their own get hard split
+        longest:int = limit - reserve - len(reopen)
+        while len(line) > longest:
+            lines.append(line[:longest])
+            line = line[longest:]
+        lines.append(line)
+
+    for line in lines:
+        if len(current) + len(line) + (reserve if in_fence or FENCE in line else 0) > limit and len(current) > 0:
+            if in_fence:
+                current += ("" if current.endswith("\n") else "\n") + FENCE
+            chunks.append(current)
+            current = reopen if in_fence else ''
+
+        current += line
+
+        if line.count(FENCE) % 2 == 1:
+            in_fence = not in_fence
+
+    if len(current.strip()) > 0:
+        chunks.append(current)
+
+    return chunks
+
+async def send_with_retry(send, content:str, kind:str, **kwargs) -> None:
+    for attempt in range(SEND_RETRIES):
+        start:float = time.perf_counter()
+
+        try:
+            await send(content, **kwargs)
+            metrics.discord_send_seconds.observe(time.perf_counter() - start, kind)
+            return
+        except discord.HTTPException as e:
+            # discord.py already waits out rate limit buckets, we only get here once it gave up
+            if e.status != 429 or attempt == SEND_RETRIES - 1:
+                print(f"Failed to send message: {e}")
+                return
+
+            # Already counted, discord.py logs every 429 it gets and metrics.RateLimitCounter picks that up
+            await asyncio.sleep(2 ** attempt)
+
+# Per channel send queue, lines posted within COALESCE_WINDOW of each other go out together
+# Posting never waits on Discord, sending happens in a background task
+class Outbox:
+    def __init__(self, channel:discord.abc.Messageable) -> None:
+        self.channel = channel
+        self.pending:list = []
+        self.task:asyncio.Task = None
+
+    def post(self, text:str) -> None:
+        self.pending.append(text if text.endswith("\n") else text + "\n")
+
+        if self.task is None or self.task.done():
+            self.task = asyncio.get_running_loop().create_task(self.flush())
+
+    async def flush(self) -> None:
+        await asyncio.sleep(COALESCE_WINDOW)
+
+        while len(self.pending) > 0:
+            text:str = "".join(self.pending)
+            self.pending.clear()
+
+            for chunk in split_message(text):
+                await send_with_retry(self.channel.send, chunk, "outbox")
+
+outboxes:dict = {} # channel id => Outbox
+
+def get_outbox(channel:discord.abc.Messageable) -> Outbox:
+    outbox:Outbox = outboxes.get(channel.id)
+    if outbox is None:
+        outbox = outboxes[channel.id] = Outbox(channel)
+
+    outbox.channel = channel # Could be a new object after a reconnect
+    return outbox
+
+# Replies to an interaction with as many messages as it takes
+async def respond(interaction:discord.Interaction, text:str, **kwargs) -> None:
+    chunks:list = split_message(text) or [text]
+
+    if not interaction.response.is_done():
+        await send_with_retry(interaction.response.send_message, chunks.pop(0), "response", **kwargs)
+
+    for chunk in chunks:
+        await send_with_retry(interaction.followup.send, chunk, "followup", **kwargs)
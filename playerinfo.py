@@ -0,0 +1,34 @@
+import re
+import sys
+
+# player_info prints one line per player, "<networkid> <userid> <name>"
+# Only real Steam players matter, bots and anything else that doesn't look like a player line is skipped
+PLAYER_INFO_LINE:re.Pattern = re.compile(r"^(\[U:\d+:\d+\])[ \t]+(\d+)[ \t]([^\r\n]*)", re.MULTILINE)
+
+class PlayerInfo:
+    __slots__ = ("name", "networkid", "userid")
+
+    def __init__(self, name:str, networkid:str, userid:int) -> None:
+        self.name = name
+        self.networkid = sys.intern(networkid) # SteamID or BOT
+        self.userid = userid
+
+# Players that were already in the previous snapshot keep their PlayerInfo instead of getting a new one every poll
+def parse_player_info(response:str, previous:dict = None) -> dict:
+    player_data:dict = {}
+
+    if previous is None:
+        previous = {}
+
+    for networkid, userid, name in PLAYER_INFO_LINE.findall(response):
+        player_info:PlayerInfo = previous.get(networkid)
+        if player_info is None or player_info.name != name:
+            player_info = PlayerInfo(name, networkid, int(userid))
+
+        player_data[player_info.networkid] = player_info
+
+    return player_data
+
+# Several servers' responses in one pass, players on more than one server end up with whichever came last
+def parse_player_infos(responses:list, previous:dict = None) -> dict:
+    return parse_player_info("\n".join(responses), previous)
@@ -1,4 +1,7 @@
-import socket
+import time
+import struct
+import asyncio
+from collections import deque
 
 SERVERDATA_INVALID:int = -1
 SERVERDATA_RESPONSE_VALUE:int = 0
@@ -8,9 +11,17 @@ SERVERDATA_AUTH:int = 3
 
 PACKETID_INVALID:int = -1
 PACKETID_AUTH:int = 0
-PACKETID_COMMAND:int = 1
+PACKETID_FIRST:int = 16 # Commands get IDs from here up in pairs, command then sentinel, anything below is auth
+PACKETID_LAST:int = (1 << 31) - 2 # Wraps back around to PACKETID_FIRST
+
+PACKET_HEADER:struct.Struct = struct.Struct("<iii") # Size, ID, type
+PACKET_SIZE_MIN:int = 10 # ID + type + both null terminators
+PACKET_SIZE_MAX:int = 1 << 20 # Source never sends more than 4096 bytes of body per packet, anything near this is garbage
+READ_BUFFER_SIZE:int = 1 << 16
 
 class packet:
+	__slots__ = ("id", "type", "body")
+
 	def __init__(self, id:int, type:int, body:str) -> None:
 		self.id = id
 		self.type = type
@@ -20,13 +31,14 @@ class packet:
 		return self.body
 	
 	def to_bytes(self) -> bytes:
-		size:int = len(self.body) + 10
+		body:bytes = self.body.encode()
+		size:int = len(body) + 10 # Size of the encoded body, not the string, or non-ascii commands get cut off
 
 		return bytes(
 			size.to_bytes(4, "little", signed=True) +
 			self.id.to_bytes(4, "little", signed=True) +
 			self.type.to_bytes(4, "little", signed=True) +
-			self.body.encode() +
+			body +
 			b'\0\0'
 		)
 	
@@ -40,27 +52,95 @@ class packet:
 		
 
 
-class rcon:
+# Reads RCON frames straight out of one reusable buffer, the event loop recv_into()s for us
+# Each frame body is handed to on_frame as a memoryview that's only valid for the duration of the call
+class packet_reader(asyncio.BufferedProtocol):
+	def __init__(self, on_frame, on_close) -> None:
+		self.on_frame = on_frame
+		self.on_close = on_close
+		self.transport:asyncio.Transport = None
+
+		self.buffer:bytearray = bytearray(READ_BUFFER_SIZE)
+		self.view:memoryview = memoryview(self.buffer)
+		self.start:int = 0 # First byte not parsed yet
+		self.end:int = 0 # One past the last byte received
+	
+	def connection_made(self, transport:asyncio.Transport) -> None:
+		self.transport = transport
+	
+	def connection_lost(self, exc:Exception) -> None:
+		self.transport = None
+		self.on_close()
+	
+	def get_buffer(self, sizehint:int) -> memoryview:
+		if self.end == len(self.buffer):
+			self.compact()
+
+		return self.view[self.end:]
+	
+	def compact(self) -> None:
+		pending:int = self.end - self.start
+
+		if self.start > 0:
+			# Slide the partial frame back to the front
+			self.view[:pending] = self.view[self.start:self.end]
+		else:
+			# Partial frame fills the whole buffer, only happens with oversized frames
+			buffer:bytearray = bytearray(len(self.buffer) * 2)
+			buffer[:pending] = self.view[:pending]
+			self.buffer = buffer
+			self.view = memoryview(buffer)
+		
+		self.start = 0
+		self.end = pending
+	
+	def buffer_updated(self, nbytes:int) -> None:
+		self.end += nbytes
+
+		while self.end - self.start >= PACKET_HEADER.size:
+			size, id, type = PACKET_HEADER.unpack_from(self.buffer, self.start)
+
+			if size < PACKET_SIZE_MIN or size > PACKET_SIZE_MAX:
+				# Lost track of framing, nothing after this can be trusted
+				self.transport.close()
+				return
+
+			frame_end:int = self.start + 4 + size
+			if frame_end > self.end:
+				break # Short read, wait for the rest
+
+			body:memoryview = self.view[self.start + PACKET_HEADER.size:frame_end - 2] # Discard null-terminators
+			self.start = frame_end
+			self.on_frame(id, type, body)
+			body.release()
+		
+		if self.start == self.end:
+			self.start = 0
+			self.end = 0
+
+
+class arcon:
 	def __init__(self, address:str, port:int, password:str, timeout:float = 5.0, silent:bool = False) -> None:
 		self.address = address
 		self.port = port
 		self.password = password
+		self.timeout = timeout
 		self.is_authorized = False
 		self.is_open = False
 		self.silent = silent
+		self.connect_time:float = 0.0 # Seconds the last connect and auth took, for metrics
+		self.auth_time:float = 0.0
 
-		self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-		self.sock.settimeout(timeout)
+		self.transport:asyncio.Transport = None
+		self.packets:deque = deque() # Frames that aren't part of a command response
+		self.packet_waiter:asyncio.Future = None
 
-		try:
-			self.sock.connect((address, port))
-			self.is_open = True
-		except: # I'd really prefer only catch exceptions we care about, but it looks like we can get platform-specific exceptions
-			self.is_open = False
-			self.sock.close()
-
-		if self.is_open:
-			self.auth()
+		# Every command gets its own ID and its response gets split over several packets,
+		# they're stitched together here until the server mirrors back the command's sentinel packet
+		# Several commands can be in flight at once, the server answers them in order
+		self.next_id:int = PACKETID_FIRST
+		self.pending:dict = {} # command id => (response bytearray, future)
+		self.sentinels:dict = {} # sentinel id => command id
 	
 	def debug_output(self, output:str):
 		if not self.silent:
@@ -69,57 +149,158 @@ class rcon:
 	def is_ready(self) -> bool:
 		return self.is_open and self.is_authorized
 	
-	def send(self, id:int, type:int, body:str):
-		data:bytes = packet(id, type, body).to_bytes()
+	async def connect(self) -> bool:
+		loop:asyncio.AbstractEventLoop = asyncio.get_running_loop()
+		start:float = time.perf_counter()
 
 		try:
-			self.sock.send(data)
-		except:
-			self.is_open = False
-			self.sock.close()
+			self.transport, _ = await asyncio.wait_for(
+				loop.create_connection(lambda: packet_reader(self.on_frame, self.on_close), self.address, self.port),
+				self.timeout
+			)
+			self.is_open = True
+		except (OSError, asyncio.TimeoutError):
+			self.close()
+			return False
+
+		self.connect_time = time.perf_counter() - start
+		await self.auth()
+		self.auth_time = time.perf_counter() - start - self.connect_time
+
+		return self.is_ready()
 	
-	def recv(self):
-		try:
-			data:bytes = self.sock.recv(4)
-		except:
-			self.is_open = False
-			self.sock.close()
-			return packet(PACKETID_INVALID, SERVERDATA_INVALID, '')
+	def close(self):
+		self.is_open = False
+		self.is_authorized = False
 
-		size:int = int.from_bytes(data, "little", signed=True)
+		if self.transport is not None:
+			self.transport.close()
+			self.transport = None
+		
+		self.on_close()
+	
+	def on_close(self) -> None:
+		self.is_open = False
+		self.is_authorized = False
 
-		try:
-			data = self.sock.recv(size)
-			return packet.from_bytes(data, size)
-		except: # I'd really prefer only catch exceptions we care about, but it looks like we can get platform-specific exceptions
-			self.is_open = False
-			self.sock.close()
+		if self.packet_waiter is not None and not self.packet_waiter.done():
+			self.packet_waiter.set_result(None)
+		
+		for _, waiter in self.pending.values():
+			if not waiter.done():
+				waiter.set_result(None)
+		
+		self.pending.clear()
+		self.sentinels.clear()
+	
+	def on_frame(self, id:int, type:int, body:memoryview) -> None:
+		if type == SERVERDATA_RESPONSE_VALUE:
+			pending:tuple = self.pending.get(id)
+			if pending is not None:
+				pending[0].extend(body)
+				return
+
+			command_id:int = self.sentinels.get(id)
+			if command_id is not None:
+				if len(body) == 0: # Mirror of the sentinel, everything before it belongs to the command
+					self.sentinels.pop(id)
+					response, waiter = self.pending.pop(command_id)
+					if not waiter.done():
+						waiter.set_result(response)
+				return
+		
+		if id >= PACKETID_FIRST:
+			return # Junk packet Source sends after a sentinel mirror, or the rest of something we gave up on
+		
+		self.packets.append(packet(id, type, str(body, "utf-8", "replace")))
+
+		if self.packet_waiter is not None and not self.packet_waiter.done():
+			self.packet_waiter.set_result(None)
+	
+	async def send(self, id:int, type:int, body:str):
+		if not self.is_open:
+			return
+
+		self.transport.write(packet(id, type, body).to_bytes())
+	
+	async def recv(self) -> packet:
+		if len(self.packets) == 0 and self.is_open:
+			self.packet_waiter = asyncio.get_running_loop().create_future()
+
+			try:
+				await asyncio.wait_for(self.packet_waiter, self.timeout)
+			except asyncio.TimeoutError:
+				self.close()
+			finally:
+				self.packet_waiter = None
+
+		if len(self.packets) > 0:
+			return self.packets.popleft()
 
 		return packet(PACKETID_INVALID, SERVERDATA_INVALID, '')
 	
-	def exec_command(self, command:str) -> str:
+	def allocate_id(self) -> int:
+		id:int = self.next_id
+		self.next_id = id + 2 if id + 2 < PACKETID_LAST else PACKETID_FIRST
+		return id
+	
+	async def exec_command(self, command:str) -> str:
+		return (await self.exec_commands([command]))[0]
+	
+	# Sends every command in one write and waits for all the responses, so the whole batch costs one round trip
+	# Responses come back in the same order, '' for all of them if the connection failed or timed out
+	async def exec_commands(self, commands:list) -> list:
 		if not self.is_ready():
-			return ''
+			return [''] * len(commands)
 		
-		self.send(PACKETID_COMMAND, SERVERDATA_EXECCOMMAND, command)
-		response:packet = self.recv()
+		loop:asyncio.AbstractEventLoop = asyncio.get_running_loop()
+		ids:list = []
+		waiters:list = []
+		data:bytearray = bytearray()
+
+		for command in commands:
+			id:int = self.allocate_id()
+			waiter:asyncio.Future = loop.create_future()
+			self.pending[id] = (bytearray(), waiter)
+			self.sentinels[id + 1] = id
+			ids.append(id)
+			waiters.append(waiter)
 
-		if response.id != PACKETID_COMMAND or response.type != SERVERDATA_RESPONSE_VALUE:
-			return ''
+			# Empty response value right after the command, the server answers in order
+			# so once it's mirrored back we know we've got every packet of the real response
+			data += packet(id, SERVERDATA_EXECCOMMAND, command).to_bytes()
+			data += packet(id + 1, SERVERDATA_RESPONSE_VALUE, '').to_bytes()
+
+		self.transport.write(data)
+
+		try:
+			_, waiting = await asyncio.wait(waiters, timeout=self.timeout)
+			if len(waiting) > 0:
+				self.close()
+		finally:
+			# Whatever is still here was given up on, anything that arrives for it later gets dropped
+			for id in ids:
+				self.pending.pop(id, None)
+				self.sentinels.pop(id + 1, None)
+			
+			for waiter in waiters:
+				waiter.cancel()
 		
-		return response.get_body()
+		responses:list = [waiter.result() if not waiter.cancelled() else None for waiter in waiters]
+		
+		# Decode once at the end, packets can split multibyte characters
+		return [str(response, "utf-8", "replace") if response is not None else '' for response in responses]
 
-	def auth(self):
-		self.send(PACKETID_AUTH, SERVERDATA_AUTH, self.password)
-		response:packet = self.recv()
+	async def auth(self):
+		await self.send(PACKETID_AUTH, SERVERDATA_AUTH, self.password)
+		response:packet = await self.recv()
 
 		if response.id == PACKETID_INVALID:
-			self.is_open = False
-			self.sock.close()
+			self.close()
 			self.debug_output("Invalid RCON response")
 			return
 		elif response.type == SERVERDATA_RESPONSE_VALUE: # Should receive empty response first
-			response = self.recv()
+			response = await self.recv()
 		else:
 			self.debug_output("Unexpected RCON response")
 			return
@@ -131,3 +312,36 @@ class rcon:
 		self.is_authorized = True # Success!
 		self.debug_output("RCON authorized")
 
+
+# Blocking wrapper around arcon for scripts and the REPL
+# Don't use this from the bot, it runs its own event loop and will block the caller
+class rcon:
+	def __init__(self, address:str, port:int, password:str, timeout:float = 5.0, silent:bool = False) -> None:
+		self.loop = asyncio.new_event_loop()
+		self.client = arcon(address, port, password, timeout, silent)
+		self.loop.run_until_complete(self.client.connect())
+	
+	@property
+	def is_open(self) -> bool:
+		return self.client.is_open
+	
+	@property
+	def is_authorized(self) -> bool:
+		return self.client.is_authorized
+	
+	def is_ready(self) -> bool:
+		return self.client.is_ready()
+	
+	def exec_command(self, command:str) -> str:
+		return self.loop.run_until_complete(self.client.exec_command(command))
+	
+	def exec_commands(self, commands:list) -> list:
+		return self.loop.run_until_complete(self.client.exec_commands(commands))
+	
+	def close(self):
+		if self.loop.is_closed():
+			return
+
+		self.client.close()
+		self.loop.run_until_complete(asyncio.sleep(0)) # Let the transport finish closing
+		self.loop.close()
@@ -0,0 +1,140 @@
+import time
+import socket
+import asyncio
+import metrics
+from rcon import arcon
+
+# Keeps one authenticated connection per server alive between polls
+# so a steady state poll only costs a single command round trip
+class PooledConnection:
+    def __init__(self) -> None:
+        self.conn:arcon = None
+        self.failures:int = 0
+        self.retry_at:float = 0.0
+        self.lock:asyncio.Lock = asyncio.Lock()
+
+class RCONPool:
+    def __init__(self, timeout:float = 5.0, backoff_min:float = 1.0, backoff_max:float = 30.0, dns_ttl:float = 300.0) -> None:
+        self.timeout = timeout
+        self.backoff_min = backoff_min
+        self.backoff_max = backoff_max
+        self.dns_ttl = dns_ttl
+        self.slots:dict = {} # RCONInfo => PooledConnection
+        self.addresses:dict = {} # hostname => (ip, expiry)
+
+    async def resolve(self, host:str, port:int) -> str:
+        now:float = time.monotonic()
+        cached = self.addresses.get(host)
+        if cached is not None and cached[1] > now:
+            return cached[0]
+
+        infos:list = await asyncio.get_running_loop().getaddrinfo(host, port, family=socket.AF_INET, type=socket.SOCK_STREAM)
+        ip:str = infos[0][4][0]
+        self.addresses[host] = (ip, now + self.dns_ttl)
+        return ip
+
+    def fail(self, slot:PooledConnection, info) -> None:
+        metrics.rcon_failures.inc(f"{info.address}:{info.port}")
+
+        if slot.conn is not None:
+            slot.conn.close()
+            slot.conn = None
+
+        slot.failures += 1
+        delay:float = min(self.backoff_max, self.backoff_min * (2 ** (slot.failures - 1)))
+        slot.retry_at = time.monotonic() + delay
+
+    async def get(self, info) -> arcon:
+        slot:PooledConnection = self.slots.get(info)
+        if slot is None:
+            slot = self.slots[info] = PooledConnection()
+
+        async with slot.lock:
+            if slot.conn is not None and slot.conn.is_ready():
+                return slot.conn
+
+            if slot.conn is not None:
+                # Dropped since last use, idle connections get closed on us, so try again right away
+                # Backoff only starts if the reconnect fails too
+                slot.conn.close()
+                slot.conn = None
+
+            if time.monotonic() < slot.retry_at:
+                return None # Still backing off
+
+            try:
+                ip:str = await self.resolve(info.address, info.port)
+            except (OSError, UnicodeError):
+                self.addresses.pop(info.address, None)
+                self.fail(slot, info)
+                return None
+
+            conn:arcon = arcon(ip, info.port, info.password, timeout=self.timeout, silent=True)
+            try:
+                connected:bool = await conn.connect()
+            except asyncio.CancelledError:
+                # Ran out of cycle time, treat it like a timeout so dead hosts still back off
+                conn.close()
+                self.fail(slot, info)
+                raise
+
+            if not connected:
+                conn.close()
+                self.addresses.pop(info.address, None) # Maybe the server moved, resolve again next time
+                self.fail(slot, info)
+                return None
+
+            metrics.rcon_connect_seconds.observe(conn.connect_time, f"{info.address}:{info.port}")
+            metrics.rcon_auth_seconds.observe(conn.auth_time, f"{info.address}:{info.port}")
+
+            slot.conn = conn
+            slot.failures = 0
+            slot.retry_at = 0.0
+            return conn
+
+    # Whether a poll right now would go over a connection that's already open
+    def is_ready(self, info) -> bool:
+        slot:PooledConnection = self.slots.get(info)
+        return slot is not None and slot.conn is not None and slot.conn.is_ready()
+
+    # Returns None when the server couldn't be reached, so callers can tell failures apart from empty output
+    async def exec_command(self, info, command:str) -> str:
+        responses:list = await self.exec_commands(info, [command])
+        return responses[0] if responses is not None else None
+
+    # Pipelined on one connection, one round trip for the lot, None if the server couldn't be reached
+    async def exec_commands(self, info, commands:list) -> list:
+        conn:arcon = await self.get(info)
+        if conn is None:
+            return None
+
+        slot:PooledConnection = self.slots.get(info)
+        start:float = time.perf_counter()
+
+        try:
+            responses:list = await conn.exec_commands(commands)
+        except asyncio.CancelledError:
+            # Cancelled mid-command, the reply could still be in flight so the stream can't be trusted anymore
+            conn.close()
+            raise
+        finally:
+            if not conn.is_open and slot is not None and slot.conn is conn:
+                self.fail(slot, info)
+
+        if not conn.is_open:
+            return None
+        
+        metrics.rcon_command_seconds.observe(time.perf_counter() - start, f"{info.address}:{info.port}")
+
+        return responses
+
+    def close(self, info) -> None:
+        slot:PooledConnection = self.slots.pop(info, None)
+        if slot is not None and slot.conn is not None:
+            slot.conn.close()
+
+    def close_all(self) -> None:
+        for info in list(self.slots):
+            self.close(info)
+
+        self.addresses.clear()
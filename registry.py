@@ -0,0 +1,92 @@
+import time
+import metrics
+from threading import Lock
+from types import MappingProxyType
+
+# Copy-on-write map, the dict behind it is never modified once published
+# Readers just grab whatever dict is current and never block, writers copy,
+# modify and swap it in under the lock, which is never held across I/O
+class Registry:
+    def __init__(self, lock:Lock, name:str) -> None:
+        self.lock = lock
+        self.name = name
+        self.data:dict = {}
+
+    def acquire(self) -> None:
+        if not metrics.enabled:
+            self.lock.acquire()
+            return
+
+        start:float = time.perf_counter()
+        self.lock.acquire()
+        metrics.lock_wait_seconds.observe(time.perf_counter() - start, self.name)
+
+    def snapshot(self) -> MappingProxyType:
+        return MappingProxyType(self.data)
+
+    def __contains__(self, key) -> bool:
+        return key in self.data
+
+    def __getitem__(self, key):
+        return self.data[key]
+
+    def __iter__(self):
+        return iter(self.data)
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def get(self, key, default = None):
+        return self.data.get(key, default)
+
+    def keys(self):
+        return self.data.keys()
+
+    def values(self):
+        return self.data.values()
+
+    def items(self):
+        return self.data.items()
+
+    def set(self, key, value) -> None:
+        self.acquire()
+        try:
+            data:dict = self.data.copy()
+            data[key] = value
+            self.data = data
+        finally:
+            self.lock.release()
+
+    # Only adds if the key isn't there yet, returns whether it was added
+    def add(self, key, value) -> bool:
+        self.acquire()
+        try:
+            if key in self.data:
+                return False
+
+            data:dict = self.data.copy()
+            data[key] = value
+            self.data = data
+            return True
+        finally:
+            self.lock.release()
+
+    def pop(self, key, default = None):
+        self.acquire()
+        try:
+            if key not in self.data:
+                return default
+
+            data:dict = self.data.copy()
+            value = data.pop(key)
+            self.data = data
+            return value
+        finally:
+            self.lock.release()
+
+    def clear(self) -> None:
+        self.acquire()
+        try:
+            self.data = {}
+        finally:
+            self.lock.release()
@@ -0,0 +1,119 @@
+import time
+import datetime
+import asyncio
+import discord
+import outbox
+from testing import (
+    JoinStatus,
+    Tester
+)
+
+ROSTER_EDIT_INTERVAL:float = 5.0 # At most one edit this often, however many people come and go
+ROSTER_REFRESH_INTERVAL:float = 60.0 # Keeps the elapsed time ticking over while nothing changes
+
+# One message per test that gets edited in place instead of posting every join and leave
+# Each tester's line is rendered once when they change and cached, an edit only joins the cached lines
+class LiveRoster:
+    def __init__(self, channel:discord.abc.Messageable) -> None:
+        self.channel = channel
+        self.message:discord.Message = None
+        self.started:float = time.monotonic()
+        self.lines:dict = {} # networkid => (server, rendered line) for everyone connected
+        self.counts:dict = {} # server => connected testers
+        self.dirty:asyncio.Event = asyncio.Event()
+        self.task:asyncio.Task = None
+        self.ended:bool = False
+
+    def start(self) -> None:
+        self.task = asyncio.get_running_loop().create_task(self.run())
+
+    def count(self, server:str, amount:int) -> None:
+        count:int = self.counts.get(server, 0) + amount
+        if count > 0:
+            self.counts[server] = count
+        else:
+            self.counts.pop(server, None)
+
+    # Only touches the one tester, nothing gets sent until the next edit is due
+    def update(self, tester:Tester) -> None:
+        previous:tuple = self.lines.pop(tester.networkid, None)
+        if previous is not None:
+            self.count(previous[0], -1)
+
+        if tester.status == JoinStatus.CONNECTED:
+            since:str = datetime.datetime.fromtimestamp(tester.jointime).strftime("%H:%M")
+            line:str = f"{tester.name} - {tester.server or 'unknown'} (since {since})\n"
+            self.lines[tester.networkid] = (tester.server, line)
+            self.count(tester.server, 1)
+
+        self.dirty.set()
+
+    def render(self) -> str:
+        elapsed:str = str(datetime.timedelta(seconds=int(time.monotonic() - self.started)))
+        msg:str = f"Test {'ended' if self.ended else 'running'}, {elapsed} elapsed. {len(self.lines)} connected\n"
+
+        if len(self.counts) > 0:
+            msg += " | ".join(f"{server or 'unknown'}: {count}" for server, count in sorted(self.counts.items())) + "\n"
+
+        if len(self.lines) > 0:
+            # Fill up to Discord's limit a whole line at a time, keeping room for the fences and the "...and N more"
+            trailer:str = f"...and {len(self.lines)} more\n" # Longest it can get
+            budget:int = outbox.MESSAGE_LIMIT - len(msg) - len("```\n") - len("```") - len(trailer)
+
+            lines:list = []
+            for _, line in self.lines.values():
+                if len(line) > budget:
+                    break
+
+                lines.append(line)
+                budget -= len(line)
+
+            if len(lines) < len(self.lines):
+                lines.append(f"...and {len(self.lines) - len(lines)} more\n")
+
+            msg += "```\n" + "".join(lines) + "```"
+
+        return msg
+
+    async def edit(self) -> None:
+        content:str = self.render()
+
+        if self.message is not None:
+            try:
+                await self.message.edit(content=content)
+                return
+            except discord.NotFound:
+                self.message = None # Someone deleted it, post a new one
+            except discord.HTTPException as e:
+                print(f"Failed to edit live roster: {e}")
+                return
+
+        try:
+            self.message = await self.channel.send(content)
+        except discord.HTTPException as e:
+            print(f"Failed to send live roster: {e}")
+
+    async def run(self) -> None:
+        while True:
+            self.dirty.clear()
+            await self.edit()
+
+            # Whatever changes during the sleep is picked up by the next edit in one go
+            await asyncio.sleep(ROSTER_EDIT_INTERVAL)
+
+            try:
+                await asyncio.wait_for(self.dirty.wait(), ROSTER_REFRESH_INTERVAL - ROSTER_EDIT_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+    # Last edit with the final state, the message stays up as a record of the test
+    async def stop(self) -> None:
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+
+        self.ended = True
+        await self.edit()
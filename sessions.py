@@ -0,0 +1,196 @@
+import asyncio
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+# Attendance history in SQLite, so a crash mid-test doesn't lose it and /tstats has something to answer from
+# Every query runs on one worker thread, the loop only ever waits on a future
+# Totals are kept up to date as intervals close, stats never have to go through the raw intervals
+
+SCHEMA:str = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY,
+    started INTEGER NOT NULL,
+    ended INTEGER
+);
+CREATE TABLE IF NOT EXISTS session_servers (
+    session INTEGER NOT NULL,
+    server TEXT NOT NULL,
+    PRIMARY KEY (session, server)
+);
+CREATE TABLE IF NOT EXISTS intervals (
+    id INTEGER PRIMARY KEY,
+    session INTEGER NOT NULL,
+    networkid TEXT NOT NULL,
+    name TEXT NOT NULL,
+    server TEXT NOT NULL,
+    joined INTEGER NOT NULL,
+    left INTEGER
+);
+CREATE INDEX IF NOT EXISTS intervals_open ON intervals (session, networkid) WHERE left IS NULL;
+CREATE INDEX IF NOT EXISTS intervals_session ON intervals (session);
+CREATE TABLE IF NOT EXISTS attendance (
+    session INTEGER NOT NULL,
+    networkid TEXT NOT NULL,
+    seconds INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (session, networkid)
+);
+CREATE TABLE IF NOT EXISTS tester_totals (
+    networkid TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    seconds INTEGER NOT NULL DEFAULT 0,
+    sessions INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS tester_totals_seconds ON tester_totals (seconds DESC);
+"""
+
+STATS_LIMIT:int = 20
+
+class SessionStore:
+    def __init__(self, path:str) -> None:
+        self.path = path
+        self.session:int = None # Session being recorded, if any
+        self.executor:ThreadPoolExecutor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sessions")
+        self.db:sqlite3.Connection = None
+
+    def open(self) -> None:
+        self.db = sqlite3.connect(self.path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL") # WAL keeps this crash safe, it just may lose the last commit on power loss
+        self.db.executescript(SCHEMA)
+        self.db.commit()
+
+    def run(self, func, *args) -> asyncio.Future:
+        return asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=True)
+        if self.db is not None:
+            self.db.close()
+
+    # Everything below runs on the worker thread
+
+    def close_intervals(self, rows:list, left:int) -> None:
+        for id, networkid, name, joined in rows:
+            seconds:int = max(0, left - joined)
+            self.db.execute("UPDATE intervals SET left = ? WHERE id = ?", (left, id))
+            self.db.execute("UPDATE attendance SET seconds = seconds + ? WHERE session = ? AND networkid = ?", (seconds, self.session, networkid))
+            self.db.execute("UPDATE tester_totals SET seconds = seconds + ? WHERE networkid = ?", (seconds, networkid))
+
+    def open_interval(self, networkid:str, name:str, server:str, joined:int) -> None:
+        self.db.execute(
+            "INSERT INTO intervals (session, networkid, name, server, joined) VALUES (?, ?, ?, ?, ?)",
+            (self.session, networkid, name, server, joined)
+        )
+        self.db.execute("INSERT OR IGNORE INTO session_servers (session, server) VALUES (?, ?)", (self.session, server))
+
+        first:bool = self.db.execute(
+            "INSERT OR IGNORE INTO attendance (session, networkid) VALUES (?, ?)", (self.session, networkid)
+        ).rowcount == 1
+
+        self.db.execute(
+            "INSERT INTO tester_totals (networkid, name, sessions) VALUES (?, ?, ?) "
+            "ON CONFLICT (networkid) DO UPDATE SET name = excluded.name, sessions = sessions + excluded.sessions",
+            (networkid, name, 1 if first else 0)
+        )
+
+    def write_changes(self, changes:list) -> None:
+        if self.session is None:
+            return
+
+        # Nobody awaits these, errors have to be reported here
+        try:
+            with self.db:
+                for change in changes:
+                    if change[0] == "join":
+                        _, networkid, name, server, when = change
+                        self.open_interval(networkid, name, server, when)
+                    else:
+                        _, networkid, when = change
+                        self.close_intervals(self.db.execute(
+                            "SELECT id, networkid, name, joined FROM intervals WHERE session = ? AND networkid = ? AND left IS NULL",
+                            (self.session, networkid)
+                        ).fetchall(), when)
+        except sqlite3.Error as e:
+            print(f"Failed to save attendance: {e}")
+
+    def write_start(self, started:int, servers:list) -> int:
+        with self.db:
+            self.session = self.db.execute("INSERT INTO sessions (started) VALUES (?)", (started,)).lastrowid
+            self.db.executemany("INSERT OR IGNORE INTO session_servers (session, server) VALUES (?, ?)", [(self.session, server) for server in servers])
+
+        return self.session
+
+    def write_end(self, ended:int) -> None:
+        if self.session is None:
+            return
+
+        with self.db:
+            self.close_intervals(self.db.execute(
+                "SELECT id, networkid, name, joined FROM intervals WHERE session = ? AND left IS NULL", (self.session,)
+            ).fetchall(), ended)
+            self.db.execute("UPDATE sessions SET ended = ? WHERE id = ?", (ended, self.session))
+
+        self.session = None
+
+    # Returns (started, intervals in join order) for a session that was never ended, or None
+    def read_active(self) -> tuple:
+        row:tuple = self.db.execute("SELECT id, started FROM sessions WHERE ended IS NULL ORDER BY id DESC LIMIT 1").fetchone()
+        if row is None:
+            return None
+
+        self.session = row[0]
+        intervals:list = self.db.execute(
+            "SELECT networkid, name, server, joined, left FROM intervals WHERE session = ? ORDER BY joined", (self.session,)
+        ).fetchall()
+
+        return row[1], intervals
+
+    def read_stats(self, tests:int) -> tuple:
+        totals:list = self.db.execute(
+            "SELECT name, seconds, sessions FROM tester_totals ORDER BY seconds DESC LIMIT ?", (STATS_LIMIT,)
+        ).fetchall()
+
+        recent:list = self.db.execute(
+            "SELECT t.name, COUNT(*), SUM(a.seconds) FROM "
+            "(SELECT id FROM sessions ORDER BY id DESC LIMIT ?) s "
+            "JOIN attendance a ON a.session = s.id "
+            "JOIN tester_totals t ON t.networkid = a.networkid "
+            "GROUP BY a.networkid ORDER BY COUNT(*) DESC, SUM(a.seconds) DESC LIMIT ?",
+            (tests, STATS_LIMIT)
+        ).fetchall()
+
+        return totals, recent
+
+    # Loop side
+
+    # Not awaited, the worker applies batches in the order they were queued
+    def record(self, changes:list) -> None:
+        if len(changes) > 0:
+            self.run(self.write_changes, changes)
+
+    async def start_session(self, started:int, servers:list) -> int:
+        return await self.run(self.write_start, started, servers)
+
+    async def end_session(self, ended:int) -> None:
+        await self.run(self.write_end, ended)
+
+    async def resume(self) -> tuple:
+        return await self.run(self.read_active)
+
+    async def stats(self, tests:int) -> tuple:
+        return await self.run(self.read_stats, tests)
+
+
+store:SessionStore = None
+
+def open_store(path:str) -> SessionStore:
+    global store
+
+    try:
+        store = SessionStore(path)
+        store.open()
+    except sqlite3.Error as e:
+        print(f"Failed to open session database {path}, attendance won't be saved: {e}")
+        store = None
+
+    return store
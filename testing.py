@@ -1,20 +1,58 @@
 import os
+import sys
 import time
-import json
-import threading
+import asyncio
+import datetime
 import locks
-from threading import Thread
-from queue import Queue
+import metrics
 from enum import Enum
-from rcon import rcon
+from rconpool import RCONPool
+from a2s import (
+    A2SProber,
+    ServerInfo
+)
+from registry import Registry
+from journal import Journal
+from changeindex import ChangeIndex
+from changepages import ChangePages
+from playerinfo import (
+    PlayerInfo,
+    parse_player_info
+)
 
 TEST_CHANGES_FILE_NAME = "test_changes.json"
+TEST_CHANGES_JOURNAL_NAME = "test_changes.journal" # Everything done since test_changes.json was last written
+POLL_CYCLE_DEADLINE:float = 4.0 # Seconds, servers that haven't answered by then count as failed for this cycle
+POLL_INTERVAL_MIN:float = 1.0 # While players are on or coming and going
+POLL_INTERVAL_MAX:float = 16.0 # Empty or failing servers back off up to this
+BREAKER_THRESHOLD:int = 5 # Consecutive failures before we consider a server dead
+BREAKER_PROBE_INTERVAL:float = 60.0 # How often a dead server gets probed
+LOG_RECONCILE_INTERVAL:float = 30.0 # player_info safety net for servers pushing their logs to us
+PROBE_RETRY_INTERVAL:float = 60.0 # Query ports that have never answered only get asked again this often
+
+# A failing server keeps its last good player list until it has failed this many polls in a row or for this long
+# Network blips shouldn't look like everyone leaving and then rejoining a few seconds later
+failure_grace:int = 3
+failure_grace_time:float = 30.0
+# Players have to be seen for join_hold / missing for leave_hold seconds before it counts
+join_hold:float = 2.0
+leave_hold:float = 10.0
+
+# Ask servers for A2S_INFO over UDP before every RCON poll, RCON is only touched when they answer
+# Turn it off for servers whose query port isn't reachable from here
+probe_enabled:bool = True
+probe_timeout:float = 1.0
 
 test_active:bool = False
-test_changes:list = []
-testers:dict = {}
-rcon_infos:dict = {}
-player_status_queue:Queue = Queue()
+test_changes:dict = {} # ID => TestChange, IDs only go up so this stays in the order they were added
+next_change_id:int = 1
+testers:Registry = Registry(locks.testers, "testers") # networkid => Tester
+rcon_infos:Registry = Registry(locks.rcon, "rcon") # "address:port" => RCONInfo
+player_status_queue:asyncio.Queue = None # Created by the playtest task on the bot's loop
+rcon_pool:RCONPool = RCONPool()
+test_changes_journal:Journal = Journal(TEST_CHANGES_FILE_NAME, TEST_CHANGES_JOURNAL_NAME)
+test_changes_index:ChangeIndex = ChangeIndex() # For /tcs
+test_changes_pages:ChangePages = ChangePages(test_changes) # For /tcl
 
 testing_channel_id = os.getenv("PLAYTEST_CHANNELID", "-1")
 
@@ -23,131 +61,627 @@ try:
 except:
     testing_channel_id = -1
 
-if testing_channel_id == -1:
-    print("WARNING: No channel ID specified to forward playtest messages to, please set PLAYTEST_CHANNELID environment variable.")
-
 class JoinStatus(Enum):
     DISCONNECTED = 0
     CONNECTED = 1
 
+# Everything below gets created a lot during long tests, slots keep them small and dict free
+# SteamIDs are interned so every snapshot, tester and event shares the same string
 class TestChange:
-    def __init__(self, change, author):
+    __slots__ = ("id", "change", "author", "tags")
+
+    def __init__(self, change, author, id:int = 0, tags:tuple = ()):
+        self.id = id # Never reused, so an ID someone copied out of /tcl can't end up pointing at a different change
         self.change = change
         self.author = author
+        self.tags = tags
+
+    def describe(self) -> str:
+        tags:str = "".join(f" #{tag}" for tag in self.tags)
+        return f"{self.id}. {self.change}{tags} (Added by: {self.author})"
 
 class Tester:
-    def __init__(self, networkid:str, name:str, jointime:int, status:JoinStatus):
-        self.networkid = networkid
+    __slots__ = ("networkid", "name", "jointime", "endtime", "status", "server")
+
+    def __init__(self, networkid:str, name:str, jointime:int, status:JoinStatus, server:str = ''):
+        self.networkid = sys.intern(networkid)
         self.name = name
         self.jointime = jointime
         self.endtime = -1
         self.status = status
+        self.server = server # Name of the server they were last seen on
 
 class PlayerJoinStatus:
-    def __init__(self, name:str, networkid:str, status:JoinStatus) -> None:
-        self.name = name
-        self.networkid = networkid
-        self.status = status
+    __slots__ = ("name", "networkid", "status", "server")
 
-class PlayerInfo:
-    def __init__(self, name:str, networkid:str, userid:int) -> None:
+    def __init__(self, name:str, networkid:str, status:JoinStatus, server:str = '') -> None:
         self.name = name
-        self.networkid = networkid # SteamID or BOT
-        self.userid = userid
+        self.networkid = sys.intern(networkid)
+        self.status = status
+        self.server = server
 
 class RCONInfo:
+    __slots__ = ("address", "port", "password", "comment")
+
     def __init__(self, address:str, port:int, password:str, comment:str = '') -> None:
         self.address = address
         self.port = port
         self.password = password
         self.comment = comment
+    
+    # Compare by what we connect with so a changed password gets a fresh pooled connection
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, RCONInfo):
+            return NotImplemented
+        return (self.address, self.port, self.password) == (other.address, other.port, other.password)
+    
+    def __hash__(self) -> int:
+        return hash((self.address, self.port, self.password))
+
+    def display_name(self) -> str:
+        return self.comment if len(self.comment) > 0 else f"{self.address}:{self.port}"
+
+class BreakerState(Enum):
+    CLOSED = 0 # Polling normally
+    OPEN = 1 # Server looks dead, only probe it occasionally
+    HALF_OPEN = 2 # Probe in flight
+
+# Per server polling schedule, busy servers get polled quickly and idle or dead ones back off
+class ServerState:
+    __slots__ = ("players", "response", "interval", "next_poll", "failures", "breaker", "push", "poll", "last_success", "probe", "queryable", "registered", "probe_task", "probed_at")
+
+    def __init__(self) -> None:
+        self.players:dict = {} # networkid => PlayerInfo from the last good poll
+        self.response:str = None # Raw player_info behind players, lets unchanged polls skip parsing entirely
+        self.interval:float = POLL_INTERVAL_MIN
+        self.next_poll:float = 0.0
+        self.failures:int = 0
+        self.breaker:BreakerState = BreakerState.CLOSED
+        self.push:bool = False # Server is sending us its logs, polls only reconcile
+        self.registered:bool = False # Took our logaddress_add, push starts once its first log line shows up
+        self.poll:asyncio.Task = None # Poll in flight, if any
+        self.last_success:float = 0.0
+        self.probe:ServerInfo = None # What the last A2S query got back, None if it wasn't answered
+        self.queryable:bool = False # Has answered a query before, until then a missed one doesn't mean much
+        self.probe_task:asyncio.Task = None # A2S query in flight, never more than one per server
+        self.probed_at:float = -PROBE_RETRY_INTERVAL
+    
+    def is_due(self, now:float) -> bool:
+        return self.poll is None and now >= self.next_poll
+    
+    # Returns whether the player list changed
+    def record_success(self, response:str, now:float) -> bool:
+        churned:bool = False
+
+        if response != self.response:
+            players:dict = parse_player_info(response, self.players)
+            churned = players.keys() != self.players.keys()
+            self.players = players
+            self.response = response
+
+        self.failures = 0
+        self.breaker = BreakerState.CLOSED
+        self.last_success = now
+
+        if self.push:
+            self.interval = LOG_RECONCILE_INTERVAL
+        elif churned or len(self.players) > 0:
+            self.interval = POLL_INTERVAL_MIN
+        else:
+            self.interval = min(POLL_INTERVAL_MAX, self.interval * 2)
+        
+        self.next_poll = now + self.interval
+        return churned
+    
+    # Returns whether the player list changed, which only happens once the grace period is over
+    def record_failure(self, now:float) -> bool:
+        self.failures += 1
+        # Might have restarted and lost our logaddress, register again once it's back
+        self.push = False
+        self.registered = False
+
+        dropped:bool = False
+        if len(self.players) > 0 and (self.failures >= failure_grace or now - self.last_success >= failure_grace_time):
+            self.players = {}
+            self.response = None
+            dropped = True
+
+        if self.breaker == BreakerState.HALF_OPEN or self.failures >= BREAKER_THRESHOLD:
+            self.breaker = BreakerState.OPEN
+            self.interval = BREAKER_PROBE_INTERVAL
+        else:
+            self.interval = min(POLL_INTERVAL_MAX, POLL_INTERVAL_MIN * (2 ** self.failures))
+        
+        self.next_poll = now + self.interval
+        return dropped
+    
+    def describe(self, now:float) -> str:
+        if self.probe is not None:
+            return f"{self.probe.describe()}, {self.describe_polling(now)}"
+
+        return self.describe_polling(now)
+
+    def describe_polling(self, now:float) -> str:
+        wait:int = max(0, round(self.next_poll - now))
+
+        if self.breaker != BreakerState.CLOSED:
+            return f"offline after {self.failures} failures, next probe in {wait}s"
+        
+        if self.failures > 0 and len(self.players) > 0:
+            return f"{self.failures} failures, holding on to {len(self.players)} players, retrying in {wait}s"
+
+        if self.failures > 0:
+            return f"{self.failures} failures, retrying in {wait}s"
+        
+        if self.push:
+            return f"{len(self.players)} players, receiving logs, reconciling every {self.interval:g}s"
+        
+        return f"{len(self.players)} players, polling every {self.interval:g}s"
+
+# SRCDS prints a complaint rather than failing the command, an address that's already there is fine
+def logaddress_accepted(response:str) -> bool:
+    response = response.lower()
+    return not any(word in response for word in ("unable", "unparseable", "usage", "unknown command", "invalid"))
+
+async def probe_server(prober:A2SProber, info:RCONInfo) -> ServerInfo:
+    try:
+        ip:str = await rcon_pool.resolve(info.address, info.port)
+    except (OSError, UnicodeError):
+        return None
+
+    # Source answers queries on the game port, which is the RCON port too
+    return await prober.query((ip, info.port))
+
+# One pass over the given servers for when there's no poller running to ask, RCONInfo => ServerInfo or None
+async def probe_servers(infos:list) -> dict:
+    prober:A2SProber = A2SProber(probe_timeout)
+    try:
+        await prober.start()
+    except OSError as e:
+        print(f"Failed to open the A2S query socket: {e}")
+        return {}
+
+    try:
+        results:list = await asyncio.gather(*(probe_server(prober, info) for info in infos))
+    finally:
+        prober.close()
 
-class RCONThread(Thread):
-    def __init__(self):
-        super().__init__()
-        self.should_stop = threading.Event()
+    return dict(zip(infos, results))
+
+class RCONPoller:
+    def __init__(self, log_listener = None):
+        self.task:asyncio.Task = None
+        self.servers:dict = {} # RCONInfo => ServerState
+        self.log_listener = log_listener # logstream.LogListener, None to rely on polling alone
+        self.log_sources:dict = {} # (ip, port) => RCONInfo
+        self.seen_on:dict = {} # networkid => name of the server they're on, as of the last merge
+        self.absent_since:dict = {} # networkid => when a connected tester first went missing
+        self.present_since:dict = {} # networkid => when someone not yet connected first showed up
+        self.prober:A2SProber = None
     
+    def start(self):
+        self.task = asyncio.get_running_loop().create_task(self.run())
+
     def stop(self):
-        self.should_stop.set()
-
-    def run(self) -> None:
-        while not self.should_stop.is_set():
-            player_data:dict = {}
-
-            locks.rcon.acquire()
-            for info in rcon_infos.values():
-                player_info:list = rcon(info.address, info.port, info.password, silent=True).exec_command("player_info").splitlines()
-
-                NETWORKID:int = 0
-                USERID:int = 1
-
-                for line in player_info:
-                    split_line:list = line.split()
-                    if not split_line[NETWORKID].startswith("[U:"):
-                        continue
-                    
-                    player_name_start:int = len(split_line[NETWORKID]) + len(split_line[USERID]) + 2 # Plus 2 for spaces
-                    player_data[split_line[NETWORKID]] = PlayerInfo(
-                        line[player_name_start:],
-                        split_line[NETWORKID],
-                        split_line[USERID]
-                    )
+        if self.task is not None:
+            self.task.cancel()
+    
+    def is_alive(self) -> bool:
+        return self.task is not None and not self.task.done()
+    
+    async def join(self):
+        if self.task is None:
+            return
+
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+
+    def describe_server(self, info:RCONInfo, now:float) -> str:
+        state:ServerState = self.servers.get(info)
+        return state.describe(now) if state is not None else None
+
+    async def run(self) -> None:
+        try:
+            if self.log_listener is not None:
+                self.log_listener.on_event = self.on_log_event
+                self.log_listener.on_line = self.on_log_line
+
+                try:
+                    await self.log_listener.start()
+                except OSError as e:
+                    print(f"Failed to start log listener, falling back to polling: {e}")
+                    self.log_listener = None
+
+            if probe_enabled:
+                self.prober = A2SProber(probe_timeout)
+                try:
+                    await self.prober.start()
+                except OSError as e:
+                    print(f"Failed to open the A2S query socket, going straight to RCON: {e}")
+                    self.prober = None
+
+            await self.poll_forever()
+        finally:
+            for state in self.servers.values():
+                if state.poll is not None:
+                    state.poll.cancel()
+                if state.probe_task is not None:
+                    state.probe_task.cancel()
+
+            if self.log_listener is not None:
+                await self.unregister_logaddresses()
+                self.log_listener.close()
+
+            if self.prober is not None:
+                self.prober.close()
+                self.prober = None
+
+            rcon_pool.close_all()
+
+    # Every due server gets polled at once in its own task, bounded by POLL_CYCLE_DEADLINE
+    # A cycle only waits on servers that answered last time, ones that are already failing
+    # finish in the background and get picked up by a later cycle, so they can't hold up the live ones
+    # Returns (RCONInfo, response) for every poll that finished, response is None if the server couldn't be reached
+    async def poll_cycle(self, infos:list) -> list:
+        start:float = time.perf_counter()
+
+        for info in infos:
+            self.servers[info].poll = asyncio.ensure_future(self.poll_server(info))
+
+        waiting:list = [
+            state.poll for state in self.servers.values()
+            if state.poll is not None and state.failures == 0 and not state.poll.done()
+        ]
+
+        if len(waiting) > 0:
+            await asyncio.wait(waiting)
+        
+        results:list = []
+        for info, state in self.servers.items():
+            if state.poll is None or not state.poll.done():
+                continue
+
+            response:str = None
+            if not state.poll.cancelled() and state.poll.exception() is None:
+                response = state.poll.result()
             
-            locks.rcon.release()
-            locks.testers.acquire()
-
-            # Do all this after gathering player data or else multiple servers will cause a join/disconnect loop
-            for networkid in testers:
-                if networkid not in player_data:
-                    tester:Tester = testers[networkid]
-                    if tester.status != JoinStatus.DISCONNECTED:
-                        player_status_queue.put(PlayerJoinStatus(tester.name, tester.networkid, JoinStatus.DISCONNECTED))
+            state.poll = None
+            results.append((info, response))
+        
+        if len(infos) > 0:
+            metrics.poll_cycle_seconds.observe(time.perf_counter() - start)
+
+        return results
+
+    async def poll_server(self, info:RCONInfo) -> str:
+        try:
+            return await asyncio.wait_for(self.poll_server_unbounded(info), POLL_CYCLE_DEADLINE)
+        except asyncio.TimeoutError:
+            return None
+
+    async def poll_server_unbounded(self, info:RCONInfo) -> str:
+        state:ServerState = self.servers.get(info)
+
+        # Every due server's query goes out on the same socket in the same pass, the ones that stay quiet
+        # fail after probe_timeout instead of an RCON connect timeout
+        # Only opening a session waits on the query, a poll over a connection that's already up doesn't
+        if self.prober is not None and state is not None:
+            if state.queryable and not rcon_pool.is_ready(info):
+                # Shielded, the query is shared with the next poll if this one runs out of time
+                if await asyncio.shield(self.start_probe(info, state)) is None:
+                    return None
+            elif state.queryable or time.monotonic() - state.probed_at >= PROBE_RETRY_INTERVAL:
+                # Asked on the side to keep the map and player count fresh, or in case a quiet query port has opened up
+                # Never heard from it means it might only have RCON reachable from here, so that's not waited on
+                self.start_probe(info, state)
+
+        # Listen for it before asking, the first log line can beat the response here
+        source:tuple = None
+        if self.log_listener is not None and state is not None and not state.registered:
+            source = await self.add_log_source(info)
+
+        if source is not None:
+            state.registered = True
+
+            # Register and take the snapshot in one round trip
+            # The server runs them in order, so nothing slips through in between
+            responses:list = await rcon_pool.exec_commands(info, [
+                f"logaddress_add {self.log_listener.get_logaddress()}",
+                "log on",
+                "player_info"
+            ])
+            if responses is None:
+                state.registered = False
+                return None
+
+            # Still polled normally until its logs actually reach us, see on_log_line
+            # Not asked again after a refusal until the server fails and starts over
+            if not logaddress_accepted(responses[0]):
+                print(f"{info.display_name()} didn't take our log address: {responses[0].strip()}")
+                self.log_sources.pop(source, None)
+                state.push = False
+
+            return responses[-1]
+        
+        return await rcon_pool.exec_command(info, "player_info")
+
+    def start_probe(self, info:RCONInfo, state:ServerState) -> asyncio.Task:
+        if state.probe_task is None or state.probe_task.done():
+            state.probe_task = asyncio.ensure_future(self.probe(info, state))
+
+        return state.probe_task
+
+    async def probe(self, info:RCONInfo, state:ServerState) -> ServerInfo:
+        state.probed_at = time.monotonic()
+        probe:ServerInfo = await probe_server(self.prober, info)
+        state.probe = probe
+
+        if probe is not None:
+            state.queryable = True
+        else:
+            metrics.probe_failures.inc(f"{info.address}:{info.port}")
+
+        return probe
+
+    # Returns the source its logs will come from, None if it couldn't be resolved
+    async def add_log_source(self, info:RCONInfo) -> tuple:
+        try:
+            ip:str = await rcon_pool.resolve(info.address, info.port)
+        except (OSError, UnicodeError):
+            return None
+        
+        self.log_sources[(ip, info.port)] = info
+        return (ip, info.port)
+
+    async def unregister_logaddresses(self) -> None:
+        logaddress:str = self.log_listener.get_logaddress()
+        tasks:list = [
+            asyncio.ensure_future(rcon_pool.exec_command(info, f"logaddress_del {logaddress}"))
+            for info, state in self.servers.items() if state.registered
+        ]
+
+        if len(tasks) == 0:
+            return
+        
+        # Best effort, servers drop dead log addresses on their own eventually
+        done, pending = await asyncio.wait(tasks, timeout=1.0)
+        for task in pending:
+            task.cancel()
+
+    def log_source(self, addr:tuple) -> ServerState:
+        info:RCONInfo = self.log_sources.get(addr[:2])
+
+        if info is None:
+            # Logs can come from the game port rather than the RCON port, fall back to the address if it's unambiguous
+            candidates:list = [candidate for source, candidate in self.log_sources.items() if source[0] == addr[0]]
+            if len(candidates) == 1:
+                info = candidates[0]
+        
+        return self.servers.get(info) if info is not None else None
+
+    # First line from a server we registered with, its logs get through so polling can back off to reconciling
+    def on_log_line(self, addr:tuple) -> None:
+        state:ServerState = self.log_source(addr)
+        if state is None or state.push or not state.registered:
+            return
+
+        state.push = True
+        state.interval = LOG_RECONCILE_INTERVAL
+        state.next_poll = time.monotonic() + state.interval
+
+    def on_log_event(self, addr:tuple, status:JoinStatus, player:PlayerInfo) -> None:
+        state:ServerState = self.log_source(addr)
+        if state is None or not state.push:
+            return
+        
+        if status == JoinStatus.CONNECTED:
+            state.players[player.networkid] = player
+        else:
+            state.players.pop(player.networkid, None)
+        
+        state.response = None # Snapshot no longer matches the last poll, make the next one parse again
+        
+        self.diff(self.merge())
+
+    def merge(self) -> dict:
+        player_data:dict = {}
+        self.seen_on.clear()
+
+        for info, state in self.servers.items():
+            player_data.update(state.players)
+
+            server:str = info.display_name()
+            for networkid in state.players:
+                self.seen_on[networkid] = server
+        
+        return player_data
+
+    async def poll_forever(self) -> None:
+        while True:
+            infos:list = list(rcon_infos.values())
+
+            changed:bool = False
+            registered:set = set(infos)
+            for info in list(self.servers):
+                if info not in registered:
+                    state:ServerState = self.servers.pop(info)
+                    if state.poll is not None:
+                        state.poll.cancel()
+                    if state.probe_task is not None:
+                        state.probe_task.cancel()
+
+                    # /remts closes the bot's pool, but in the worker process the connection lives in this one
+                    rcon_pool.close(info)
+                    changed = True
             
-            for networkid in player_data:
-                player_info:PlayerInfo = player_data[networkid]
-                if networkid not in testers:
-                    player_status_queue.put(PlayerJoinStatus(player_info.name, player_info.networkid, JoinStatus.CONNECTED))
-                else:
-                    tester:Tester = testers[networkid]
-                    if tester.status != JoinStatus.CONNECTED:
-                        player_status_queue.put(PlayerJoinStatus(player_info.name, player_info.networkid, JoinStatus.CONNECTED))
-
-
-            locks.testers.release()
-            time.sleep(1.0)
-
-
-def save_test_changes() -> None:
-    data:dict = {"changes": []}
-    changes:list = data["changes"]
-
-    change:TestChange
-    for change in test_changes:
-        changes.append(
-            {
-                "author": change.author,
-                "change": change.change
-            }
-        )
-    try:
-        file = open(TEST_CHANGES_FILE_NAME, 'w')
-        file.write(json.dumps(data, indent=4))
+            for source, info in list(self.log_sources.items()):
+                if info not in registered:
+                    self.log_sources.pop(source)
+
+            now:float = time.monotonic()
+            due:list = []
+            for info in infos:
+                state:ServerState = self.servers.get(info)
+                if state is None:
+                    state = self.servers[info] = ServerState()
+
+                if state.is_due(now):
+                    if state.breaker == BreakerState.OPEN:
+                        state.breaker = BreakerState.HALF_OPEN
+                    due.append(info)
+            
+            # Merge only once the whole cycle is in
+            results:list = await self.poll_cycle(due)
+            now = time.monotonic()
+
+            for info, response in results:
+                state:ServerState = self.servers[info]
+                if response is None:
+                    if state.record_failure(now):
+                        changed = True
+
+                    # Keep the connection through the odd missed poll, only let go once the server counts as down
+                    if state.breaker == BreakerState.OPEN:
+                        rcon_pool.close(info)
+                elif state.record_success(response, now):
+                    changed = True
+            
+            # Joins and leaves still being held back need another look even if nothing changed
+            if changed or len(self.absent_since) > 0 or len(self.present_since) > 0:
+                self.diff(self.merge())
+
+            # Sleep until the next server is due, but keep an eye out for newly added servers and background polls
+            next_poll:float = min((state.next_poll for state in self.servers.values() if state.poll is None), default=now + POLL_INTERVAL_MIN)
+            await asyncio.sleep(min(POLL_INTERVAL_MIN, max(0.0, next_poll - time.monotonic())))
+    
+    def diff(self, player_data:dict) -> None:
+        current:dict = testers.snapshot()
+        now:float = time.monotonic()
+
+        # Do all this after gathering player data or else multiple servers will cause a join/disconnect loop
+        for networkid in current:
+            tester:Tester = current[networkid]
+            if networkid in player_data or tester.status == JoinStatus.DISCONNECTED:
+                self.absent_since.pop(networkid, None)
+                continue
+
+            # Only gone once they've been missing for a while, a quick reconnect or a blip isn't a leave
+            if now - self.absent_since.setdefault(networkid, now) >= leave_hold:
+                self.absent_since.pop(networkid)
+                player_status_queue.put_nowait(PlayerJoinStatus(tester.name, tester.networkid, JoinStatus.DISCONNECTED))
+        
+        for networkid in player_data:
+            player_info:PlayerInfo = player_data[networkid]
+            server:str = self.seen_on.get(networkid, '')
+            tester:Tester = current.get(networkid)
+
+            if tester is None or tester.status != JoinStatus.CONNECTED:
+                if now - self.present_since.setdefault(networkid, now) >= join_hold:
+                    self.present_since.pop(networkid)
+                    player_status_queue.put_nowait(PlayerJoinStatus(player_info.name, player_info.networkid, JoinStatus.CONNECTED, server))
+            elif tester.server != server:
+                # Switching servers counts too, it's only announced on the live roster
+                player_status_queue.put_nowait(PlayerJoinStatus(player_info.name, player_info.networkid, JoinStatus.CONNECTED, server))
         
-        file.close()
-    except IOError as e:
-        print(f"Failed to save test changes: {e}")
+        # Showed up and went again before the join counted
+        for networkid in list(self.present_since):
+            if networkid not in player_data:
+                self.present_since.pop(networkid)
+
+
+# Plain string work on a list nobody else is using, /tstop runs it off the loop
+def build_attendance_report(testers:list, now:int, date) -> str:
+    lines:list = [f"Today's test has ended.\nPlayers in attendance for {date}\n```\n"]
+
+    tester:Tester
+    for tester in testers:
+        endtime:int = tester.endtime if tester.endtime != -1 else now
+        lines.append(f"{tester.name} was present for {datetime.timedelta(seconds=endtime - tester.jointime)}\n")
+
+    lines.append("```")
+    return "".join(lines)
+
+def test_changes_snapshot() -> dict:
+    return {
+        "next_id": next_change_id,
+        "changes": [
+            {"id": change.id, "author": change.author, "change": change.change, "tags": list(change.tags)}
+            for change in test_changes.values()
+        ]
+    }
+
+def add_change(change:TestChange) -> None:
+    global next_change_id
+
+    test_changes[change.id] = change
+    test_changes_index.add(change)
+    test_changes_pages.invalidate(change.id)
+    next_change_id = max(next_change_id, change.id + 1)
+
+# Same code runs for commands and for replaying the journal, so both always end up with the same list
+def apply_test_change(entry:dict) -> bool:
+    op:str = entry["op"]
+
+    if op == "add":
+        entry.setdefault("id", next_change_id) # Written back so the journal records the ID that was handed out
+        add_change(TestChange(entry["change"], entry["author"], entry["id"], tuple(entry.get("tags", ()))))
+    elif op == "edit" or op == "remove":
+        id:int = entry.get("id")
+        if id is None:
+            # Journals from before stable IDs went by position
+            index:int = entry["index"]
+            if index < 0 or index >= len(test_changes):
+                return False
+            id = list(test_changes)[index]
+
+        change:TestChange = test_changes.get(id)
+        if change is None:
+            return False
+
+        test_changes_index.remove(change)
+        test_changes_pages.invalidate(id)
+        if op == "edit":
+            change.change = entry["change"]
+            if "tags" in entry:
+                change.tags = tuple(entry["tags"])
+            test_changes_index.add(change)
+        else:
+            test_changes.pop(id)
+    elif op == "purge":
+        test_changes.clear() # IDs keep counting up, an old ID never points at a new change
+        test_changes_index.clear()
+        test_changes_pages.clear()
+    else:
+        return False
+    
+    return True
+
+# Applies a change and queues it for disk, never waits on the write
+def record_test_change(entry:dict) -> bool:
+    if not apply_test_change(entry):
+        return False
+
+    test_changes_journal.append(entry, test_changes_snapshot)
+    return True
 
 def load_test_changes() -> None:
-    try:
-        file = open(TEST_CHANGES_FILE_NAME, 'r')
-        data:dict = json.load(file)
-        test_changes.clear()
+    global next_change_id
 
-        changes:list = data["changes"]
-        change:dict
+    snapshot, entries = test_changes_journal.load()
+    test_changes.clear()
+    test_changes_index.clear()
+    test_changes_pages.clear()
+    next_change_id = 1
 
-        for change in changes:
-            test_changes.append(TestChange(change["change"], change["author"]))
-        
-    except IOError as e:
-        pass # Failure is acceptable here
\ No newline at end of file
+    if snapshot is not None:
+        next_change_id = int(snapshot.get("next_id", 1))
+
+        change:dict
+        for change in snapshot["changes"]:
+            # Files from before stable IDs get them handed out in list order
+            add_change(TestChange(change["change"], change["author"], int(change.get("id", next_change_id)), tuple(change.get("tags", ()))))
+    
+    for entry in entries:
+        apply_test_change(entry)
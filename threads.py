@@ -1,3 +1,3 @@
-from testing import RCONThread
+from testing import RCONPoller
 
-rcon:RCONThread = RCONThread()
\ No newline at end of file
+rcon:RCONPoller = RCONPoller()
\ No newline at end of file
@@ -0,0 +1,275 @@
+import time
+import asyncio
+import traceback
+import multiprocessing
+import testing
+from logstream import LogListener
+from testing import (
+    JoinStatus,
+    Tester,
+    PlayerJoinStatus,
+    RCONInfo,
+    RCONPoller
+)
+
+# Optional mode where polling and diffing happen in a child process, away from the bot's interpreter and its GIL
+# The child runs an ordinary RCONPoller and streams join/leave events back over a pipe
+# PollerProcess stands in for the RCONPoller on the bot's side and restarts the child if it dies or goes quiet
+#
+# Bot => worker: ("init", servers, testers, settings), ("servers", servers), ("stop", None)
+# Worker => bot: ("events", [(status, networkid, name, server), ...]), ("states", {"address:port": description})
+WORKER_HEARTBEAT_INTERVAL:float = 1.0 # The worker sends server states this often, doubles as its heartbeat
+WORKER_HEARTBEAT_TIMEOUT:float = 10.0 # Hung if we haven't heard from it in this long
+WORKER_RESTART_MIN:float = 1.0
+WORKER_RESTART_MAX:float = 30.0
+WORKER_STABLE_TIME:float = 60.0 # Up this long and the restart backoff starts over
+
+def server_list() -> list:
+    return [(info.address, info.port, info.password, info.comment) for info in testing.rcon_infos.values()]
+
+def tester_list() -> list:
+    return [(tester.networkid, tester.name, tester.status.value, tester.server) for tester in testing.testers.values()]
+
+# Config is only loaded in the bot, the worker gets what it needs from it
+def settings() -> dict:
+    return {
+        "failure_grace": testing.failure_grace,
+        "failure_grace_time": testing.failure_grace_time,
+        "join_hold": testing.join_hold,
+        "leave_hold": testing.leave_hold,
+        "probe_enabled": testing.probe_enabled,
+        "probe_timeout": testing.probe_timeout
+    }
+
+
+# Worker side
+
+def set_servers(servers:list) -> None:
+    keys:set = set()
+    for address, port, password, comment in servers:
+        key:str = f"{address}:{port}"
+        keys.add(key)
+
+        if testing.rcon_infos.get(key) != RCONInfo(address, port, password, comment):
+            testing.rcon_infos.set(key, RCONInfo(address, port, password, comment))
+
+    for key in list(testing.rcon_infos.keys()):
+        if key not in keys:
+            testing.rcon_infos.pop(key)
+
+# Keeps the worker's copy of the testers in step with the bot's, that's what the poller diffs against
+def apply_event(networkid:str, name:str, status:JoinStatus, server:str) -> None:
+    tester:Tester = testing.testers.get(networkid)
+    if tester is None:
+        testing.testers.set(networkid, Tester(networkid, name, 0, status, server))
+        return
+
+    tester.status = status
+    if status == JoinStatus.CONNECTED:
+        tester.server = server
+
+async def worker_main(conn, log_settings:tuple) -> None:
+    loop:asyncio.AbstractEventLoop = asyncio.get_running_loop()
+    stopped:asyncio.Event = asyncio.Event()
+
+    # The bot's state arrives before anything else, nothing gets polled until we have it
+    _, servers, testers, values = conn.recv()
+    for name, value in values.items():
+        setattr(testing, name, value)
+
+    set_servers(servers)
+    for networkid, name, status, server in testers:
+        apply_event(networkid, name, JoinStatus(status), server)
+
+    def on_message() -> None:
+        try:
+            kind, payload = conn.recv()
+        except (EOFError, OSError):
+            stopped.set() # Bot went away
+            return
+
+        if kind == "servers":
+            set_servers(payload)
+        elif kind == "stop":
+            stopped.set()
+
+    loop.add_reader(conn.fileno(), on_message)
+
+    testing.player_status_queue = asyncio.Queue()
+    log_listener:LogListener = LogListener(*log_settings) if log_settings is not None else None
+    poller:RCONPoller = RCONPoller(log_listener)
+    poller.start()
+
+    async def forward() -> None:
+        while True:
+            batch:list = [await testing.player_status_queue.get()]
+            while not testing.player_status_queue.empty():
+                batch.append(testing.player_status_queue.get_nowait())
+
+            events:list = []
+            player_status:PlayerJoinStatus
+            for player_status in batch:
+                apply_event(player_status.networkid, player_status.name, player_status.status, player_status.server)
+                events.append((player_status.status.value, player_status.networkid, player_status.name, player_status.server))
+
+            conn.send(("events", events))
+
+    async def heartbeat() -> None:
+        while True:
+            now:float = time.monotonic()
+            conn.send(("states", {f"{info.address}:{info.port}": state.describe(now) for info, state in poller.servers.items()}))
+            await asyncio.sleep(WORKER_HEARTBEAT_INTERVAL)
+
+    tasks:list = [loop.create_task(forward()), loop.create_task(heartbeat())]
+    stop_task:asyncio.Task = loop.create_task(stopped.wait())
+
+    try:
+        await asyncio.wait(tasks + [poller.task, stop_task], return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        loop.remove_reader(conn.fileno())
+        for task in tasks + [stop_task]:
+            task.cancel()
+
+        poller.stop()
+        await poller.join()
+
+    # Anything that ended on its own rather than being told to stop is a crash, let the supervisor deal with it
+    for task in tasks + [poller.task]:
+        if task.done() and not task.cancelled() and task.exception() is not None:
+            traceback.print_exception(task.exception())
+            raise SystemExit(1)
+
+def run_worker(conn, log_settings:tuple) -> None:
+    try:
+        asyncio.run(worker_main(conn, log_settings))
+    except KeyboardInterrupt:
+        pass
+
+
+# Bot side
+
+# Same start/stop/is_alive/join/describe_server as RCONPoller so the bot doesn't care which one it has
+class PollerProcess:
+    def __init__(self, log_settings:tuple = None) -> None:
+        self.log_settings = log_settings # LogListener arguments, it gets created in the worker
+        self.task:asyncio.Task = None
+        self.process:multiprocessing.Process = None
+        self.conn = None
+        self.connected:bool = False
+        self.last_heard:float = 0.0
+        self.servers_sent:dict = None # Registry data the worker last got, copy-on-write means a new dict is a change
+        self.states:dict = {} # "address:port" => description from the worker
+        self.restarts:int = 0
+
+    def start(self):
+        self.task = asyncio.get_running_loop().create_task(self.supervise())
+
+    def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+
+    def is_alive(self) -> bool:
+        return self.task is not None and not self.task.done()
+
+    async def join(self):
+        if self.task is None:
+            return
+
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+
+    def describe_server(self, info:RCONInfo, now:float) -> str:
+        return self.states.get(f"{info.address}:{info.port}")
+
+    def spawn(self) -> None:
+        context = multiprocessing.get_context("spawn") # Fork would copy the bot's loop, sockets and threads
+        self.conn, child = context.Pipe()
+        self.process = context.Process(target=run_worker, args=(child, self.log_settings), name="beepo-poller", daemon=True)
+        self.process.start()
+        child.close()
+
+        # Resync, a restarted worker picks up where the bot's state is rather than starting from nothing
+        self.servers_sent = testing.rcon_infos.data
+        self.conn.send(("init", server_list(), tester_list(), settings()))
+
+        self.connected = True
+        self.last_heard = time.monotonic()
+        asyncio.get_running_loop().add_reader(self.conn.fileno(), self.on_message)
+
+    def on_message(self) -> None:
+        try:
+            kind, payload = self.conn.recv()
+        except (EOFError, OSError):
+            self.disconnect()
+            return
+
+        self.last_heard = time.monotonic()
+
+        if kind == "events":
+            for status, networkid, name, server in payload:
+                testing.player_status_queue.put_nowait(PlayerJoinStatus(name, networkid, JoinStatus(status), server))
+        elif kind == "states":
+            self.states = payload
+
+    def disconnect(self) -> None:
+        if not self.connected:
+            return
+
+        self.connected = False
+        asyncio.get_running_loop().remove_reader(self.conn.fileno())
+        self.conn.close()
+
+    def is_healthy(self) -> bool:
+        return self.connected and self.process.is_alive() and time.monotonic() - self.last_heard < WORKER_HEARTBEAT_TIMEOUT
+
+    async def kill(self) -> None:
+        if self.connected:
+            try:
+                self.conn.send(("stop", None))
+            except OSError:
+                pass
+
+        self.disconnect()
+
+        # Give it a moment to unregister its log addresses, then make sure it's gone
+        loop:asyncio.AbstractEventLoop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.process.join, 2.0)
+        if self.process.is_alive():
+            self.process.kill()
+            await loop.run_in_executor(None, self.process.join)
+
+        self.states = {}
+
+    async def supervise(self) -> None:
+        backoff:float = WORKER_RESTART_MIN
+
+        try:
+            while True:
+                self.spawn()
+                started:float = time.monotonic()
+
+                while self.is_healthy():
+                    # /addts and /remts swap in a new dict, pass the list on when that happens
+                    if testing.rcon_infos.data is not self.servers_sent:
+                        self.servers_sent = testing.rcon_infos.data
+                        try:
+                            self.conn.send(("servers", server_list()))
+                        except OSError:
+                            self.disconnect()
+
+                    await asyncio.sleep(0.5)
+
+                print(f"Poller process {'exited with ' + str(self.process.exitcode) if not self.process.is_alive() else 'stopped responding'}, restarting it.")
+                await self.kill()
+                self.restarts += 1
+
+                if time.monotonic() - started > WORKER_STABLE_TIME:
+                    backoff = WORKER_RESTART_MIN
+
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, WORKER_RESTART_MAX)
+        finally:
+            if self.process is not None and self.process.is_alive():
+                await self.kill()